@@ -43,12 +43,14 @@ import errno
 import os
 import stat
 import typing
+from collections import OrderedDict
 
 import fuse
 
 import util
+from linux.block import BLOCK_SIZE
 from linux.block.device import Disk
-from linux.fs.inode import Inode, _deserialize_dir_content
+from linux.fs.inode import Inode
 from linux.fs.vfs import VFS
 from linux.sched import Process
 
@@ -59,15 +61,31 @@ fuse.fuse_python_api = (0, 2)
 # NOTE: Use an absolute path so we can, if we want to, inspect the file
 # after FUSE creates it.
 SLOWFS_STORAGE_PATH = "/tmp/fuse_slowfs.raw"
+# Maximum number of paths for which getattr() results are cached.
+ATTR_CACHE_SIZE = 1024
+# Mount options, see `man mount.fuse`. All changes go through this
+# process, so the kernel can cache file data and attributes. Moreover,
+# let the kernel bundle small writes into large ones instead of calling
+# SlowFS.write() for every 4KiB.
+FUSE_MOUNT_OPTIONS = (
+    "big_writes",
+    "max_write=131072",
+    "kernel_cache",
+    "entry_timeout=60",
+    "attr_timeout=60",
+)
 
 # To debug this implementation use logs, e.g.:
 # with open("/tmp/slowfs-logs", "w") as f: f.write("LOG: ...")
 
-def create_slowfs_blockdev(pathname: str) -> Disk:
+def create_slowfs_blockdev(pathname: str, size: int = 688128) -> Disk:
     """Create the slowfs filesystem in a file at pathname.
 
     Note, block devices are just files in Linux.
 
+    The file is preallocated to `size` bytes, so that the filesystem of
+    the host doesn't have to allocate space on every write to it.
+
     Returns a block device object on top of the file at pathname.
 
     """
@@ -75,15 +93,40 @@ def create_slowfs_blockdev(pathname: str) -> Disk:
         fname = os.path.basename(pathname)
         path = pathname.removesuffix(fname)
         os.makedirs(path, exist_ok=True)
-        with open(pathname, "w") as _: ...  # create empty file
-        disk = Disk(pathname)
+        fd = os.open(pathname, os.O_CREAT | os.O_WRONLY, 0o644)
+        try:
+            os.posix_fallocate(fd, 0, size)
+        finally:
+            os.close(fd)
+        disk = Disk(pathname, size=size)
         util.mkfs_slowfs(disk=disk)
     else:
-        disk = Disk(pathname)
+        disk = Disk(pathname, size=size)
 
     return disk
 
 
+class FileHandle:
+    """State FUSE keeps for us while a file is open.
+
+    Note that FUSE interprets integers returned by open() as a status,
+    thus we can't return the file descriptor directly.
+
+    """
+    def __init__(self, fd: int):
+        self.fd = fd
+
+
+def _stat(inode: Inode) -> fuse.Stat:
+    st = fuse.Stat()
+    st.st_mode = inode.i_mode
+    st.st_size = inode.i_size
+    # TODO: This nlink value is wrong, but without specifying a
+    # value FUSE won't work.
+    st.st_nlink = 1
+    return st
+
+
 # https://github.com/libfuse/python-fuse/blob/master/README.new_fusepy_api.rst
 #
 # >>> fuse.Fuse._attrs
@@ -97,6 +140,8 @@ def create_slowfs_blockdev(pathname: str) -> Disk:
 class SlowFS(fuse.Fuse):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # None of the slowfs kernel structures are thread safe.
+        self.multithreaded = False
 
         self.syscall_tbl = util.start_kernel(vfs=VFS)
         self.proc = Process(self.syscall_tbl)
@@ -105,7 +150,21 @@ class SlowFS(fuse.Fuse):
         # TODO: Get from sys.argv
         self.proc.mount(self.disk, "/")
 
+        # FUSE calls getattr() on virtually every operation, so we cache
+        # its results instead of looking up the path every time.
+        self._attr_cache: OrderedDict[str, fuse.Stat] = OrderedDict()
+        # Content of small files, filled on their first read() so later
+        # reads don't have to go through open(), read() and close().
+        # Only files that are in the attribute cache can have an entry.
+        self._small_cache: dict[str, bytes] = {}
+        # Whether there are changes that haven't been persisted yet.
+        self._dirty = False
+
     def getattr(self, path: str) -> "fuse.Stat | Err":
+        if (st := self._attr_cache.get(path)) is not None:
+            self._attr_cache.move_to_end(path)
+            return st
+
         supers = self.proc.sysfs()
         if not supers:
             return -errno.ENOENT
@@ -117,17 +176,17 @@ class SlowFS(fuse.Fuse):
             else:
                 return -errno.ENOENT
 
-        st = fuse.Stat()
-        st.st_mode = inode.i_mode
-        st.st_size = inode.i_size
-        # TODO: This nlink value is wrong, but without specifying a
-        # value FUSE won't work.
-        st.st_nlink = 1
+        st = _stat(inode)
+        self._attr_cache[path] = st
+        if len(self._attr_cache) > ATTR_CACHE_SIZE:
+            evicted, _ = self._attr_cache.popitem(last=False)
+            self._small_cache.pop(evicted, None)
         return st
 
     def mkdir(self, path: str, mode: int) -> "ResultInt":
         res = self.proc.mkdir(pathname=path, mode=mode)
-        self._persist()
+        self._invalidate(path)
+        self._dirty = True
         return res
 
     def mknod(self, path: str, mode: int, dev) -> "ResultInt":
@@ -141,42 +200,97 @@ class SlowFS(fuse.Fuse):
         if fd < 0:
             return fd
         res = self.proc.close(fd)
-        self._persist()
+        self._invalidate(path)
+        self._dirty = True
         return res
 
-    def read(self, path: str, size: int, offset: int) -> "bytearray | Err":
-        fd = self.proc.open(
-            pathname=path,
-            flags=os.O_RDONLY,
-            mode=0o644,
-        )
+    def open(self, path: str, flags: int) -> "FileHandle | Err":
+        fd = self.proc.open(pathname=path, flags=flags, mode=0o644)
         # Error.
         if fd < 0:
             return fd
-
-        err = self.proc.seek(fd=fd, offset=offset)
-        if err < 0:
-            return err
-        ans = self.proc.read(fd=fd, count=size)
-        self.proc.close(fd)
-        return ans
-
-    def write(self, path: str, buf: bytes, offset: int) -> "int | Err":
-        fd = self.proc.open(
-            pathname=path,
-            flags=os.O_CREAT | os.O_RDWR,
-            mode=0o644,
+        # FUSE passes the returned object to all subsequent calls on the
+        # opened file, so we don't have to open it again on every read
+        # and write.
+        return FileHandle(fd)
+
+    def release(self, path: str, flags: int, fh: "FileHandle") -> "ResultInt":
+        return self.proc.close(fh.fd)
+
+    def fgetattr(self, path: str, fh: "FileHandle") -> "fuse.Stat | Err":
+        file = self.proc.oft[fh.fd]
+        if file is None:
+            return -errno.EBADF
+        return _stat(file.inode)
+
+    def read(
+        self,
+        path: str,
+        size: int,
+        offset: int,
+        fh: "FileHandle | None" = None,
+    ) -> "bytes | bytearray | Err":
+        if (data := self._small_cache.get(path)) is not None:
+            return data[offset:offset+size]
+
+        # Small files fit in a single block, so read them completely on
+        # the first read and serve subsequent reads from memory.
+        st = self._attr_cache.get(path)
+        small = (
+            st is not None
+            and stat.S_ISREG(st.st_mode)
+            and st.st_size <= BLOCK_SIZE
         )
-        # Error.
-        if fd < 0:
-            return fd
-
-        err = self.proc.seek(fd=fd, offset=offset)
-        if err < 0:
-            return err
-        ans = self.proc.write(fd=fd, buf=buf)
-        self.proc.close(fd)
-        self._persist()
+        if small:
+            read_size, read_offset = st.st_size, 0
+        else:
+            read_size, read_offset = size, offset
+
+        if fh is not None:
+            ans = self._read(fh.fd, read_size, read_offset)
+        else:
+            fd = self.proc.open(
+                pathname=path,
+                flags=os.O_RDONLY,
+                mode=0o644,
+            )
+            # Error.
+            if fd < 0:
+                return fd
+
+            ans = self._read(fd, read_size, read_offset)
+            self.proc.close(fd)
+
+        if not small or isinstance(ans, int):
+            return ans
+        data = bytes(ans)
+        self._small_cache[path] = data
+        return data[offset:offset+size]
+
+    def write(
+        self,
+        path: str,
+        buf: bytes,
+        offset: int,
+        fh: "FileHandle | None" = None,
+    ) -> "int | Err":
+        if fh is not None:
+            ans = self._write(fh.fd, buf, offset)
+        else:
+            fd = self.proc.open(
+                pathname=path,
+                flags=os.O_CREAT | os.O_RDWR,
+                mode=0o644,
+            )
+            # Error.
+            if fd < 0:
+                return fd
+
+            ans = self._write(fd, buf, offset)
+            self.proc.close(fd)
+
+        self._invalidate(path)
+        self._dirty = True
         return ans
 
     def readdir(self, path: str, offset: int):
@@ -194,25 +308,66 @@ class SlowFS(fuse.Fuse):
         if not stat.S_ISDIR(inode.i_mode):
             return -errno.ENOTDIR
 
-        for _, block in inode.blocks:
-            for ino, name in _deserialize_dir_content(block):
-                if ino == 0:
-                    break
+        for name in inode.name_index():
+            yield fuse.Direntry(name.decode(encoding="ascii"))
+
+    def _read(self, fd: int, size: int, offset: int) -> "bytearray | Err":
+        err = self.proc.seek(fd=fd, offset=offset)
+        if err < 0:
+            return err
+        return self.proc.read(fd=fd, count=size)
+
+    def _write(self, fd: int, buf: bytes, offset: int) -> "int | Err":
+        err = self.proc.seek(fd=fd, offset=offset)
+        if err < 0:
+            return err
+        return self.proc.write(fd=fd, buf=buf)
+
+    def _invalidate(self, path: str) -> None:
+        """Drop cached attributes that a change to path might affect.
+
+        Creating a file can grow its parent directory, thus the parent
+        is dropped as well.
+
+        """
+        self._attr_cache.pop(path, None)
+        self._attr_cache.pop(os.path.dirname(path), None)
+        self._small_cache.pop(path, None)
+
+    def flush(self, path: str, fh: "FileHandle | None" = None) -> "ResultInt":
+        # Called on every close(2) of the file.
+        self._persist()
+        return 0
+
+    def fsync(
+        self,
+        path: str,
+        isfsyncfile: bool,
+        fh: "FileHandle | None" = None,
+    ) -> "ResultInt":
+        self._persist()
+        return 0
 
-                yield fuse.Direntry(name.decode(encoding="ascii"))
+    def fsdestroy(self) -> None:
+        self._persist()
+        self.disk.close()
 
     def _persist(self) -> None:
         """Persist filesystem changes to disk.
 
-        FUSE doesn't implement it directly so we simply invoke it on
-        every filesystem change.
+        Instead of syncing the entire filesystem on every change, changes
+        are only persisted when FUSE asks for it, e.g. on close(2) and
+        fsync(2), or when it is unmounted.
 
         """
+        if not self._dirty:
+            return
         supers = self.proc.sysfs()
         if not supers:
             return
         sb = supers["/"]
         sb.sync_fs()
+        self._dirty = False
 
 
 def main():
@@ -224,6 +379,8 @@ def main():
     )
 
     server.parse(errex=1)
+    for opt in FUSE_MOUNT_OPTIONS:
+        server.fuse_args.add(opt)
     server.main()
 
 
@@ -1,18 +1,22 @@
 import errno
+import functools
 import os
 
 from linux.block.device import Disk
 from linux.fs.vfs import VFS
-from linux.sched import Process
+from linux.sched import Process, SyscallTable
 
 import util
 
 
-def create_slowfs_blockdev(pathname: str) -> Disk:
+def create_slowfs_blockdev(pathname: str, size: int = 688128) -> Disk:
     """Create the slowfs filesystem in a file at pathname.
 
     Note, block devices are just files in Linux.
 
+    The file is preallocated to `size` bytes, so that the filesystem of
+    the host doesn't have to allocate space on every write to it.
+
     Returns a block device object on top of the file at pathname.
 
     """
@@ -20,30 +24,43 @@ def create_slowfs_blockdev(pathname: str) -> Disk:
         fname = os.path.basename(pathname)
         path = pathname.removesuffix(fname)
         os.makedirs(path, exist_ok=True)
-        with open(pathname, "w") as _: ...
+        fd = os.open(pathname, os.O_CREAT | os.O_WRONLY, 0o644)
+        try:
+            os.posix_fallocate(fd, 0, size)
+        finally:
+            os.close(fd)
 
-    disk = Disk(pathname)
+    disk = Disk(pathname, size=size)
     util.mkfs_slowfs(disk=disk)
     return disk
 
 
+@functools.cache
+def kernel() -> SyscallTable:
+    """Return the system call table of the running kernel.
+
+    There is only a single kernel, thus all processes share its system
+    call table and thereby the state of its VFS, e.g. the mounted
+    filesystems and their inodes.
+
+    """
+    return util.start_kernel(vfs=VFS)
+
+
 if __name__ == "__main__":
     # Path to file to store filesystem in. Inspect the local file for
     # yourself to see the bytes that represent the filesystem.
     storage_path = "tmp/slowfs.raw"
     # Simulate having a block device with the slowfs file system on it.
     disk = create_slowfs_blockdev(storage_path)
-    # Interface for userspace processes to interact with the kernel.
-    syscall_tbl = util.start_kernel(vfs=VFS)
-
     # Create a process and give it access to the full system call
     # table, i.e. allowing it to run every system call.
-    sudo = Process(syscall_tbl)
+    sudo = Process(kernel())
     sudo.mount(disk, "/mountpoint")
 
     # NOTE: We could've given only a subset of the system calls to this
     # process to mimic security.
-    proc = Process(syscall_tbl)
+    proc = Process(kernel())
     fd = proc.open(
         pathname="/mountpoint/file",
         # If the file doesn't exist, then create it. Open it in
@@ -86,7 +103,9 @@ if __name__ == "__main__":
     # Sync dirty filesystem state to disk on unmount.
     sudo.umount("/mountpoint")
 
-    # Check whether state was correctly persisted.
+    # Check whether state was correctly persisted. Use a new disk, the
+    # old one would serve the reads from its cache.
+    disk.close()
     disk = Disk(storage_path)
     sudo.mount(disk, "/my-mnt")
     fd = sudo.open(
@@ -1,14 +1,21 @@
-import io
+import errno
+import math
+import mmap
 import os
 import typing
-from contextlib import contextmanager
+from collections import OrderedDict
 
-from linux.block import SECTOR_SIZE
+from linux.block import BLOCK_SIZE, SECTOR_SIZE
 
 if typing.TYPE_CHECKING:
     from linux.types import Byte
 
 
+# Maximum number of contiguous sectors for a transfer to go through the
+# cache of a Disk.
+_MAX_CACHED_TRANSFER = BLOCK_SIZE // SECTOR_SIZE
+
+
 class Sector:
     """In-memory structure to operate on physical block device sectors.
 
@@ -34,7 +41,9 @@ class Sector:
             self.data[:] = data
 
     def __iter__(self) -> typing.Iterator[int]:
-        yield from self.data
+        # Iterating over bytes runs in C, whereas a generator would
+        # resume a Python frame for every byte.
+        return iter(bytes(self._data))
 
     def __buffer__(self, flags: int, /) -> memoryview:
         return self.data.__buffer__(flags)
@@ -97,10 +106,23 @@ class Disk:
     Arguments:
         pathname: Path to underlying file that stores our disk's data.
         size: Size of disk in bytes.
+        cache_size: Maximum number of sectors cached in memory. Dirty
+            sectors are only written to the underlying storage on
+            `sync()` or when they are evicted.
+        direct: Open the underlying file with O_DIRECT to bypass the
+            page cache of the host, which would otherwise cache the same
+            data as the disk's own cache. Falls back to buffered I/O if
+            the underlying filesystem doesn't support it.
 
     """
     # TODO: Change size into size but in sectors instead of bytes.
-    def __init__(self, pathname: str, size: int = 688128):
+    def __init__(
+        self,
+        pathname: str,
+        size: int = 688128,
+        cache_size: int = 256,
+        direct: bool = False,
+    ):
         # If the disk size is not a multiple of SECTOR_SIZE then those
         # bytes will not be exposed to any user of the disk.
         self.num_sectors = size // SECTOR_SIZE
@@ -108,11 +130,60 @@ class Disk:
         if not os.path.exists(pathname):
             raise ValueError(f"Given path does not exist: {pathname}")
         self._pathname = pathname
-
-    @contextmanager
-    def storage(self) -> typing.Generator[io.FileIO, None, None]:
-        with open(self._pathname, "r+b", buffering=0) as f:
-            yield f
+        # Keep the underlying file open for the lifetime of the disk,
+        # opening it on every sector access is pure overhead.
+        self._direct = direct and hasattr(os, "O_DIRECT")
+        self._bounce: mmap.mmap | None = None
+        if self._direct:
+            try:
+                self._fd = os.open(pathname, os.O_RDWR | os.O_DIRECT)
+            except OSError as e:
+                if e.errno != errno.EINVAL:
+                    raise
+                # Filesystem doesn't support direct I/O, e.g. tmpfs.
+                self._direct = False
+        if not self._direct:
+            self._fd = os.open(pathname, os.O_RDWR)
+        # Buffered reads are served from a read-only memory map of the
+        # underlying file instead of a syscall per read, see
+        # `self._mapped_view()`. Writes still go through pwritev(2), which
+        # the map reflects since both use the page cache of the host.
+        self._mm: mmap.mmap | None = None
+        self._mm_view = memoryview(b"")
+
+        # Write-back cache of sectors, see `self._read_sectors()`.
+        self._cache: OrderedDict[int, bytearray] = OrderedDict()
+        self._dirty: set[int] = set()
+        self._cache_size = cache_size
+
+    def close(self) -> None:
+        """Release the underlying file storage of the disk."""
+        if self._fd >= 0:
+            self.sync()
+            self._unmap()
+            if self._bounce is not None:
+                self._bounce.close()
+                self._bounce = None
+            os.close(self._fd)
+            self._fd = -1
+
+    def sync(self) -> None:
+        """Write all dirty cached sectors to the underlying storage."""
+        if not self._dirty:
+            return
+
+        # Contiguous dirty sectors are written out in a single call.
+        ids = sorted(self._dirty)
+        start = prev = ids[0]
+        for id in ids[1:] + [-1]:
+            if id == prev + 1:
+                prev = id
+                continue
+
+            bufs = [self._cache[i] for i in range(start, prev + 1)]
+            self._pwrite(bufs, start * SECTOR_SIZE)
+            start = prev = id
+        self._dirty.clear()
 
     def read_sector(self, id: int) -> Sector:
         """Read sector from disk into memory.
@@ -126,12 +197,9 @@ class Disk:
         if id >= self.num_sectors:
             raise IndexError("Sector does not exist on this disk.")
 
-        offset = id * SECTOR_SIZE
         # Allocate memory buffer.
         sector = Sector(id)
-        with self.storage() as storage:
-            storage.seek(offset)
-            storage.readinto(sector)
+        self._read_sectors(sector.data, id)
         return sector
 
     def write_sector(self, sector: Sector) -> None:
@@ -147,7 +215,302 @@ class Disk:
         if sector.id >= self.num_sectors:
             raise IndexError("Sector does not exist on this disk.")
 
-        offset = sector.id * SECTOR_SIZE
-        with self.storage() as storage:
-            storage.seek(offset)
-            storage.write(sector)
+        self._write_sectors(sector.data, sector.id)
+
+    def read_byte(self, sector_id: int, offset: int = 0) -> "Byte":
+        """Return the byte at `offset` from the start of sector_id.
+
+        Contrary to `self.read_sector()`, no sector is copied to read
+        a single byte.
+
+        """
+        s, offset = divmod(offset, SECTOR_SIZE)
+        id = sector_id + s
+        if id >= self.num_sectors:
+            raise IndexError("Sector does not exist on this disk.")
+
+        if (buf := self._cache.get(id)) is not None:
+            return buf[offset]
+        if not self._direct:
+            with self._mapped_view(id * SECTOR_SIZE + offset, 1) as src:
+                # See `self._pread()` for bytes past the end of the file.
+                return src[0] if src else 0
+
+        return self.read_sector(id)[offset]
+
+    def read_block(self, first_sector_id: int) -> bytearray:
+        """Read the `BLOCK_SIZE` bytes starting at `first_sector_id`.
+
+        A block consists of contiguous sectors, thus instead of reading
+        it sector by sector we can read it from disk in one go.
+
+        """
+        if first_sector_id + BLOCK_SIZE // SECTOR_SIZE > self.num_sectors:
+            raise IndexError("Block does not exist on this disk.")
+
+        buf = bytearray(BLOCK_SIZE)
+        self._read_sectors(memoryview(buf), first_sector_id)
+        return buf
+
+    def pread_into(self, mv: memoryview, sector_id: int, offset: int = 0) -> None:
+        """Fill mv with the bytes at `offset` from the start of sector_id.
+
+        Reads that start and end on a sector boundary are copied into mv
+        directly, otherwise the covering sectors are read first.
+
+        """
+        sector_id, first, stop = self._covering_sectors(sector_id, offset, len(mv))
+        if first == 0 and len(mv) % SECTOR_SIZE == 0:
+            self._read_sectors(mv, sector_id)
+            return
+
+        buf = memoryview(bytearray((stop - sector_id) * SECTOR_SIZE))
+        self._read_sectors(buf, sector_id)
+        mv[:] = buf[first:first+len(mv)]
+
+    def pread(self, n: int, sector_id: int, offset: int = 0) -> bytearray:
+        """Return the n bytes at `offset` from the start of sector_id.
+
+        Contrary to `self.pread_into()`, the caller doesn't have to
+        allocate (and thus zero) a buffer first. Large transfers that
+        bypass the cache are copied straight from the underlying storage
+        into the new bytearray.
+
+        """
+        first_id, first, stop = self._covering_sectors(sector_id, offset, n)
+        count = stop - first_id
+        if self._direct or count <= _MAX_CACHED_TRANSFER or self._any_cached(first_id, stop):
+            buf = bytearray(n)
+            self.pread_into(memoryview(buf), sector_id, offset)
+            return buf
+
+        with self._mapped_view(first_id * SECTOR_SIZE + first, n) as src:
+            data = bytearray(src)
+        if len(data) < n:
+            # See `self._pread()`.
+            data += bytes(n - len(data))
+        return data
+
+    def readahead(self, n: int, sector_id: int, offset: int = 0) -> None:
+        """Announce that the n bytes at `offset` from sector_id will be read.
+
+        Lets the host start reading the bytes from its storage in the
+        background, see madvise(2). Announcing multiple ranges before
+        reading them allows the host to read them concurrently, instead
+        of one after the other on every read.
+
+        """
+        if self._direct or not hasattr(mmap, "MADV_WILLNEED"):
+            return
+        start = sector_id * SECTOR_SIZE + offset
+        if start + n > len(self._mm_view):
+            self._remap()
+        if self._mm is None or start >= len(self._mm):
+            return
+        # The start of the advised range has to be page aligned.
+        aligned = start - start % mmap.PAGESIZE
+        length = min(start + n, len(self._mm)) - aligned
+        self._mm.madvise(mmap.MADV_WILLNEED, aligned, length)
+
+    def pwrite_from(self, mv: memoryview, sector_id: int, offset: int = 0) -> None:
+        """Write mv at `offset` from the start of sector_id.
+
+        Only the partially written first and last sector are read first,
+        since the disk can only write complete sectors. The sectors in
+        between are overwritten completely and thus written directly.
+
+        """
+        sector_id, first, _ = self._covering_sectors(sector_id, offset, len(mv))
+        n = len(mv)
+        ptr = 0
+        if first != 0:
+            ptr = min(SECTOR_SIZE - first, n)
+            self._patch_sector(sector_id, first, mv[:ptr])
+            sector_id += 1
+
+        full = (n - ptr) // SECTOR_SIZE * SECTOR_SIZE
+        if full:
+            self._write_sectors(mv[ptr:ptr+full], sector_id)
+            ptr += full
+            sector_id += full // SECTOR_SIZE
+
+        if ptr < n:
+            self._patch_sector(sector_id, 0, mv[ptr:])
+
+    def _patch_sector(self, id: int, offset: int, mv: memoryview) -> None:
+        """Overwrite part of a sector, i.e. read-modify-write."""
+        with memoryview(bytearray(SECTOR_SIZE)) as buf:
+            self._read_sectors(buf, id)
+            buf[offset:offset+len(mv)] = mv
+            self._write_sectors(buf, id)
+
+    def _covering_sectors(
+        self,
+        sector_id: int,
+        offset: int,
+        n: int,
+    ) -> tuple[int, int, int]:
+        """Return the sectors covering n bytes at offset from sector_id.
+
+        Returns:
+            The first covering sector, the offset within it and the
+            (exclusive) last covering sector.
+
+        """
+        s, offset = divmod(offset, SECTOR_SIZE)
+        sector_id += s
+        stop = sector_id + math.ceil((offset + n) / SECTOR_SIZE)
+        if stop > self.num_sectors:
+            raise IndexError("Sector does not exist on this disk.")
+        return sector_id, offset, stop
+
+    # ----
+    # Sector cache
+    # ----
+    #
+    # Sectors are cached in memory, least recently used first, so that
+    # repeated reads don't have to go to the underlying storage and
+    # writes are deferred until the disk is synced (or the sector is
+    # evicted). This coalesces the many small writes of the filesystem,
+    # e.g. inodes and directory entries, into a single write.
+    #
+    # Transfers larger than `_MAX_CACHED_TRANSFER` sectors, e.g. reading
+    # a large file sequentially, bypass the cache so they don't evict
+    # the frequently used sectors.
+
+    def _read_sectors(self, mv: memoryview, sector_id: int) -> None:
+        """Fill mv with the contiguous sectors starting at sector_id."""
+        cache = self._cache
+        count = len(mv) // SECTOR_SIZE
+        ids = range(sector_id, sector_id + count)
+        missing = [id for id in ids if id not in cache]
+        if missing:
+            self._pread(mv, sector_id * SECTOR_SIZE)
+
+        # Cached sectors take precedence since they can be dirty. Mark
+        # them as recently used before caching the missing sectors so
+        # they can't be evicted in the process.
+        for id in ids:
+            if (buf := cache.get(id)) is not None:
+                offset = (id - sector_id) * SECTOR_SIZE
+                mv[offset:offset+SECTOR_SIZE] = buf
+                cache.move_to_end(id)
+        if count > _MAX_CACHED_TRANSFER:
+            return
+        for id in missing:
+            offset = (id - sector_id) * SECTOR_SIZE
+            self._cache_put(id, mv[offset:offset+SECTOR_SIZE])
+
+    def _any_cached(self, start: int, stop: int) -> bool:
+        """Whether any of the sectors in [start, stop) is cached."""
+        cache = self._cache
+        if len(cache) < stop - start:
+            return any(start <= id < stop for id in cache)
+        return any(id in cache for id in range(start, stop))
+
+    def _write_sectors(self, mv: memoryview, sector_id: int) -> None:
+        """Write the contiguous sectors in mv starting at sector_id."""
+        if len(mv) > _MAX_CACHED_TRANSFER * SECTOR_SIZE:
+            # Write through, but keep the cache consistent.
+            self._pwrite([mv], sector_id * SECTOR_SIZE)
+            for offset in range(0, len(mv), SECTOR_SIZE):
+                id = sector_id + offset // SECTOR_SIZE
+                if (buf := self._cache.get(id)) is not None:
+                    buf[:] = mv[offset:offset+SECTOR_SIZE]
+                    self._dirty.discard(id)
+            return
+
+        for offset in range(0, len(mv), SECTOR_SIZE):
+            id = sector_id + offset // SECTOR_SIZE
+            self._cache_put(id, mv[offset:offset+SECTOR_SIZE])
+            self._dirty.add(id)
+
+    def _cache_put(self, id: int, data: memoryview) -> None:
+        cache = self._cache
+        if (buf := cache.get(id)) is not None:
+            buf[:] = data
+            cache.move_to_end(id)
+            return
+
+        cache[id] = bytearray(data)
+        if len(cache) > self._cache_size:
+            old_id, old_buf = cache.popitem(last=False)
+            if old_id in self._dirty:
+                self._pwrite([old_buf], old_id * SECTOR_SIZE)
+                self._dirty.discard(old_id)
+
+    # ----
+    # Underlying storage
+    # ----
+
+    def _pread(self, mv: memoryview, offset: int) -> None:
+        """Fill mv with the bytes of the underlying storage at offset."""
+        if self._direct:
+            bounce = self._bounce_buffer(len(mv))
+            n = os.preadv(self._fd, [bounce], offset)
+            mv[:n] = bounce[:n]
+        else:
+            with self._mapped_view(offset, len(mv)) as src:
+                n = len(src)
+                mv[:n] = src
+
+        if n < len(mv):
+            # The underlying file can be smaller than the disk, e.g.
+            # when it was just created. Just like reading a hole in a
+            # file (see lseek(2)) the missing bytes read as zeros.
+            mv[n:] = bytes(len(mv) - n)
+
+    def _pwrite(
+        self,
+        bufs: "list[bytearray | bytes | memoryview]",
+        offset: int,
+    ) -> None:
+        """Write the buffers, one after the other, to the storage at offset."""
+        if self._direct:
+            bounce = self._bounce_buffer(sum(len(buf) for buf in bufs))
+            ptr = 0
+            for buf in bufs:
+                bounce[ptr:ptr+len(buf)] = buf
+                ptr += len(buf)
+            bufs = [bounce]
+        os.pwritev(self._fd, bufs, offset)
+
+    def _mapped_view(self, offset: int, n: int) -> memoryview:
+        """Return a view of (at most) n bytes of the storage at offset.
+
+        The view is shorter if the underlying file ends before it.
+
+        """
+        end = offset + n
+        if end > len(self._mm_view):
+            # The file might have grown since it was mapped.
+            self._remap()
+        return self._mm_view[offset:end]
+
+    def _remap(self) -> None:
+        size = os.fstat(self._fd).st_size
+        if size <= len(self._mm_view):
+            return
+        self._unmap()
+        self._mm = mmap.mmap(self._fd, size, prot=mmap.PROT_READ)
+        self._mm_view = memoryview(self._mm)
+
+    def _unmap(self) -> None:
+        self._mm_view.release()
+        self._mm_view = memoryview(b"")
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _bounce_buffer(self, n: int) -> memoryview:
+        """Return a memory aligned buffer of n bytes for direct I/O.
+
+        O_DIRECT requires the memory of a transfer to be aligned, which
+        isn't guaranteed for a bytearray. Anonymous memory maps are page
+        aligned, so we copy through one that is reused across transfers.
+
+        """
+        if self._bounce is None or len(self._bounce) < n:
+            size = math.ceil(n / mmap.PAGESIZE) * mmap.PAGESIZE
+            self._bounce = mmap.mmap(-1, size)
+        return memoryview(self._bounce)[:n]
@@ -1,7 +1,6 @@
 import typing
 
-from linux.block import BLOCK_SIZE, SECTOR_SIZE
-from linux.block.device import Sector
+from linux.block import BLOCK_SIZE
 
 if typing.TYPE_CHECKING:
     from linux.block.device import Disk
@@ -43,10 +42,7 @@ class Block:
     def __getitem__(self, key: int | slice) -> "Byte | bytearray":
         if isinstance(key, int):
             assert key <= BLOCK_SIZE, "Block doesn't contain byte."
-
-            s, res = divmod(key, SECTOR_SIZE)
-            sector = self.disk.read_sector(id=self.sector_id+s)
-            return sector[res]
+            return self.disk.read_byte(self.sector_id, key)
 
         else:
             start, stop = key.start or 0, key.stop or BLOCK_SIZE
@@ -56,23 +52,15 @@ class Block:
             if key.step is not None or start < 0 or stop < 0:
                 raise NotImplementedError("Slice final data yourself.")
 
-            # TODO: Can't I come up with better code for this?
-            n = min(BLOCK_SIZE, stop - start)
-            buf = bytearray(n)
-            ptr_buf = 0
-            s, offset = divmod(start, SECTOR_SIZE)
-            bsize_in_sectors = BLOCK_SIZE // SECTOR_SIZE
-            for s in range(s, bsize_in_sectors):
-                sector = self.disk.read_sector(id=self.sector_id+s)
-
-                size = min(SECTOR_SIZE - offset, n - ptr_buf)
-                buf[ptr_buf:ptr_buf+size] = sector[offset:offset+size]
-                ptr_buf += size
-
-                offset = 0
-                if ptr_buf == n:
-                    break
+            if start == 0 and stop >= BLOCK_SIZE:
+                return self.disk.read_block(self.sector_id)
 
+            # Only copy the requested bytes, straight into the result,
+            # instead of reading the whole block and slicing it.
+            stop = min(stop, BLOCK_SIZE)
+            buf = bytearray(max(stop - start, 0))
+            if buf:
+                self.disk.pread_into(memoryview(buf), self.sector_id, start)
             return buf
 
     def __len__(self) -> int:
@@ -84,14 +72,20 @@ class Block:
 
         if self.sector_id != other.sector_id:
             return False
-        return self[:] == other[:]
+        return self._as_bytes() == other._as_bytes()
 
     def __iter__(self) -> typing.Iterator[int]:
         """Iterate over bytes in the block in order."""
-        bsize_in_sectors = BLOCK_SIZE // SECTOR_SIZE
-        for s in range(bsize_in_sectors):
-            sector = self.disk.read_sector(id=self.sector_id+s)
-            yield from sector
+        return iter(self._as_bytes())
+
+    def _as_bytes(self) -> memoryview:
+        """Return the content of the entire block.
+
+        The block is read from disk in one go, so that all per byte
+        operations can be done in C on the returned memoryview.
+
+        """
+        return memoryview(self.disk.read_block(self.sector_id))
 
     def write(
         self,
@@ -110,23 +104,18 @@ class Block:
         if offset + n > BLOCK_SIZE:
             raise ValueError("Can't write past block size.")
 
-        # Similar code is in File.write()
-        s, offset = divmod(offset, SECTOR_SIZE)
-        bsize_in_sectors = BLOCK_SIZE // SECTOR_SIZE
-        ptr_buf = 0
-        for s in range(s, bsize_in_sectors):
-            size = min(SECTOR_SIZE - offset, n - ptr_buf)
-            if offset == 0 and size == SECTOR_SIZE:
-                sector = Sector(id=self.sector_id+s)
-            else:
-                # Note how we first need the sector to be read, even if
-                # we only want to change it partially.
-                sector = self.disk.read_sector(id=self.sector_id+s)
-
-            sector[offset:offset+size] = value[ptr_buf:ptr_buf+size]
-            self.disk.write_sector(sector)
-            ptr_buf += size
-
-            offset = 0
-            if ptr_buf >= n:
-                break
+        # Note how the disk first needs to read partially written
+        # sectors, since it can't write anything smaller than a sector.
+        self.disk.pwrite_from(value, self.sector_id, offset)
+
+    def read_into(self, offset: int, mv: memoryview) -> None:
+        """Read `len(mv)` bytes from the block at offset into mv.
+
+        Contrary to slicing the block, no intermediate buffer has to be
+        allocated (and copied) by the caller.
+
+        """
+        if offset + len(mv) > BLOCK_SIZE:
+            raise ValueError("Can't read past block size.")
+
+        self.disk.pread_into(mv, self.sector_id, offset)
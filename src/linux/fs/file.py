@@ -4,13 +4,22 @@ import os
 import stat
 import typing
 
-from linux.block import BLOCK_SIZE
+from linux.block import BLOCK_SIZE, SECTOR_SIZE
 from linux.fs.inode import Inode
 
 if typing.TYPE_CHECKING:
+    from linux.block.driver import Block
     from linux.types import Err, Success, ResultInt
 
 
+# Minimum number of bytes of a read before the disk is told about all
+# of its runs upfront, see `Disk.readahead()`.
+_READAHEAD_THRESHOLD = 64 * 1024
+# Access modes that allow writing to a file, combined once instead of on
+# every check.
+_O_WRITABLE = os.O_WRONLY | os.O_RDWR
+
+
 # https://github.com/torvalds/linux/blob/fe78e02600f83d81e55f6fc352d82c4f264a2901/include/linux/fs.h#L1070
 # https://docs.kernel.org/filesystems/api-summary.html#c.file
 class File:
@@ -77,18 +86,32 @@ class File:
             # File is not open for reading.
             return -errno.EBADF
 
-        blocks = self.inode.blocks
+        # Bind the blocks once, instead of going through the inode for
+        # every run.
+        blocks = self.inode.block_objs
+        sector_ids = self.inode.sector_ids()
         avail = self.inode.i_size - self.offset
         to_read = min(avail, count)
+        runs = list(_contiguous_runs(blocks, sector_ids, self.offset, to_read))
+        self.offset += to_read
+        if len(runs) == 1:
+            # Let the disk allocate the buffer, saving us from zeroing a
+            # buffer that is overwritten right after.
+            block, b_offset, size = runs[0]
+            return block.disk.pread(size, block.sector_id, b_offset)
+
+        if to_read >= _READAHEAD_THRESHOLD:
+            # The runs aren't contiguous, so let the disk fetch all of
+            # them at once before copying them one by one.
+            for block, b_offset, size in runs:
+                block.disk.readahead(size, block.sector_id, b_offset)
+
         buf = bytearray(to_read)
+        # Let the disk copy directly into the buffer that is returned.
+        mem = memoryview(buf)
         ptr_buf = 0
-        while to_read > 0:
-            b, b_offset = divmod(self.offset, BLOCK_SIZE)
-            _, block = blocks[b]
-            size = min(BLOCK_SIZE - b_offset, to_read)
-            buf[ptr_buf:ptr_buf+size] = block[b_offset:b_offset+size]
-            self.offset += size
-            to_read -= size
+        for block, b_offset, size in runs:
+            block.disk.pread_into(mem[ptr_buf:ptr_buf+size], block.sector_id, b_offset)
             ptr_buf += size
 
         return buf
@@ -96,9 +119,11 @@ class File:
     def write(self, buf: bytes) -> "int | Err":
         """Write buf to file at offset.
 
-        Since we haven't implemented a page cache, writing will
-        immediately write to the storage medium. Essentially doing a
-        write(2) followed by an fsync(2).
+        Since we haven't implemented a page cache, the data is handed to
+        the block device right away. The disk caches the written sectors
+        (write-back), thus they only reach the storage medium when they
+        are evicted from its cache or when the disk is synced, e.g. by
+        `SuperBlock.sync_fs()`. Just like write(2) without an fsync(2).
 
         Returns the number of written bytes or an error code.
 
@@ -112,7 +137,7 @@ class File:
         # support it anyways.
         if stat.S_ISDIR(self.inode.i_mode):
             return -errno.EISDIR
-        if not self.flags & (os.O_WRONLY | os.O_RDWR):
+        if not self.flags & _O_WRITABLE:
             # File is not open for writing.
             return -errno.EBADF
 
@@ -122,7 +147,6 @@ class File:
             self.offset = self.inode.i_size
 
         # Allocate new blocks if inode doesn't have enough space.
-        sb = self.inode.i_sb
         avail = self.inode.i_size - self.offset
         n = len(buf)
         if n > avail:
@@ -133,23 +157,15 @@ class File:
                 return err
 
         # Write bytes
-        blocks = self.inode.blocks
-        b, offset = divmod(self.offset, BLOCK_SIZE)
+        blocks = self.inode.block_objs
+        sector_ids = self.inode.sector_ids()
         ptr_buf = 0
         mem = memoryview(buf)
-        for i in range(b, len(blocks)):
-            _, block = blocks[i]
-
-            to_write = min(BLOCK_SIZE - offset, n - ptr_buf)
-            block.write(offset, mem[ptr_buf:ptr_buf+to_write])
-            ptr_buf += to_write
-            self.offset += to_write
-
-            offset = 0
-            if ptr_buf >= n:
-                break
+        for block, b_offset, size in _contiguous_runs(blocks, sector_ids, self.offset, n):
+            block.disk.pwrite_from(mem[ptr_buf:ptr_buf+size], block.sector_id, b_offset)
+            ptr_buf += size
+        self.offset += n
 
-        self.inode.i_size = max(self.inode.i_size, self.offset)
         # TODO: note that this makes opening the same file multiple
         # times not possible. Because the inode can change whilst
         # another is reading it at the same time. However, with this
@@ -157,19 +173,22 @@ class File:
         # would've to be read from the storage medium again. Thus
         # for now, a file can only be opened once.
         #
-        # NOTE: The above is fixed since all inodes are currently
-        # kept in memory. However, as the #inodes grows it could
-        # become infeasible to do so and we would need a new solution.
-        sb.write_inode(inode=self.inode)
+        # NOTE: The above is fixed since inodes that are in use are
+        # kept in memory, see `InodeCache`. The inode is written to
+        # the storage medium when the filesystem is synced.
+        if self.offset > self.inode.i_size:
+            self.inode.i_size = self.offset
+            self.inode.mark_dirty()
 
         # Success returns the number of written bytes.
         return n
 
     def flush(self) -> "ResultInt":
-        """Write content to disk."""
-        # Empty, since self.write() already stores it to the
-        # underlying Blocks. This function would change when a page
-        # cache exists.
+        """Hand buffered content to the block device."""
+        # Empty, since self.write() already hands it to the underlying
+        # Blocks. Persisting it is up to the disk's cache, see
+        # `Disk.sync()`. This function would change when a page cache
+        # exists.
         return 0
 
     def open(self) -> "Success":
@@ -178,3 +197,53 @@ class File:
         # point to a device structure.
         # See: https://docs.kernel.org/filesystems/vfs.html#id2
         return 0
+
+
+def _contiguous_runs(
+    blocks: "list[Block]",
+    sector_ids: list[int],
+    offset: int,
+    n: int,
+) -> typing.Iterator[tuple["Block", int, int]]:
+    """Group the blocks covering n bytes at offset into contiguous runs.
+
+    Data blocks that are allocated one after the other tend to be
+    contiguous on disk. Just like the kernel groups block requests that
+    access contiguous blocks, we can then read or write them at once.
+
+    Arguments:
+        blocks: The blocks of the file.
+        sector_ids: The first sector of each block, see
+            `Inode.sector_ids()`.
+        offset: Offset in bytes within the file.
+        n: Number of bytes to cover.
+
+    Yields:
+        The first block of the run, the offset within that block and the
+        number of bytes of the run.
+
+    """
+    if n <= 0:
+        return
+
+    # Compute the span of blocks once, so the loop below only has to
+    # compare sector ids. The last block is inclusive and last_size is
+    # the number of bytes used from it.
+    first_b, first_offset = divmod(offset, BLOCK_SIZE)
+    last_b, last_size = divmod(offset + n - 1, BLOCK_SIZE)
+    last_size += 1
+    if first_b == last_b:
+        yield blocks[first_b], first_offset, n
+        return
+
+    bsize_in_sectors = BLOCK_SIZE // SECTOR_SIZE
+    run_start = first_b
+    run_offset = first_offset
+    for i in range(first_b + 1, last_b + 1):
+        if sector_ids[i] != sector_ids[i-1] + bsize_in_sectors:
+            yield blocks[run_start], run_offset, (i - run_start) * BLOCK_SIZE - run_offset
+            run_start = i
+            run_offset = 0
+
+    size = (last_b - run_start) * BLOCK_SIZE + last_size - run_offset
+    yield blocks[run_start], run_offset, size
@@ -1,3 +1,4 @@
+import array
 import errno
 import stat
 import struct
@@ -42,7 +43,13 @@ _MAX_DBLOCKS = 59
 # guaranteed to be nullified on removal and positive IDs are reserved
 # for in use dblocks.
 _FREE_DBLOCK_ID = -1
+# Padding for the ids of the unused data blocks, sliced to length when
+# serializing instead of building a new list every time.
+_FREE_PAD = (_FREE_DBLOCK_ID,) * _MAX_DBLOCKS
 _INODE_LAYOUT = f">IIIII{_MAX_DBLOCKS}i"
+# Compile the layout once, instead of on every (de)serialization.
+_INODE_STRUCT = struct.Struct(_INODE_LAYOUT)
+assert _INODE_STRUCT.size == INODE_SIZE, "Inode layout doesn't match INODE_SIZE."
 
 # Serialization to store directory contents on disk.
 #
@@ -60,10 +67,18 @@ _INODE_LAYOUT = f">IIIII{_MAX_DBLOCKS}i"
 # bytes limit for the layout would be exceeded.
 _MAX_FNAME_LEN = 27
 _DIR_LAYOUT = f">IB{_MAX_FNAME_LEN}s"
-_DIR_LAYOUT_SIZE = 32  # bytes
+_DIR_STRUCT = struct.Struct(_DIR_LAYOUT)
+_DIR_LAYOUT_SIZE = _DIR_STRUCT.size  # 32 bytes
 assert BLOCK_SIZE % _DIR_LAYOUT_SIZE == 0, (
     "Inode directory structure doesn't fit cleanly in a block."
 )
+_DIR_ENTRIES_PER_BLOCK = BLOCK_SIZE // _DIR_LAYOUT_SIZE
+# Locating an entry in the directory blocks is then a shift and mask,
+# instead of a division.
+assert _DIR_ENTRIES_PER_BLOCK & (_DIR_ENTRIES_PER_BLOCK - 1) == 0, (
+    "Number of directory entries per block must be a power of two."
+)
+_DIR_ENTRIES_PER_BLOCK_SHIFT = _DIR_ENTRIES_PER_BLOCK.bit_length() - 1
 
 # https://github.com/torvalds/linux/blob/fe78e02600f83d81e55f6fc352d82c4f264a2901/include/linux/fs.h#L674
 # Also see: `man inode`
@@ -96,16 +111,22 @@ class Inode:
         self.i_gid = 1000
         # Blocks that store the data of the file of this inode.
         #
-        # tuple[int, Block] so we know the id in the sb.dmap where
-        # the block is stored. Needed for persisting the inode,
-        # otherwise we can't restore the data the inode points to.
+        # The ids are the index in the sb.dmap where the block is
+        # stored. Needed for persisting the inode, otherwise we can't
+        # restore the data the inode points to.
         #
-        # TODO: Maybe a list of ints is better? The Block could store
-        # the id. Similarly, we could get the block from the id.
-        if blocks is None:
-            self.blocks: "list[tuple[int, Block]]" = []
-        else:
+        # Ids and blocks are stored in separate (parallel) sequences,
+        # instead of a sequence of (id, block) tuples, so that each can
+        # be used without unpacking tuples. See `self.blocks` for the
+        # tuples.
+        self.block_ids = array.array("i")
+        self.block_objs: "list[Block]" = []
+        # Memoized first sector of each block, see `self.sector_ids()`.
+        self._sector_ids: list[int] | None = None
+        if blocks is not None:
             self.blocks = blocks
+        # Directory entries by name, see `self.name_index()`.
+        self._name_index: dict[bytes, int] | None = None
 
         # ----
         # Attributes specific to our implementation of an inode.
@@ -118,29 +139,61 @@ class Inode:
         self.num_f_in_dir = num_f_in_dir
 
     def __eq__(self, other: object) -> bool:
-        if isinstance(other, Inode):
-            return bytes(self) == bytes(other)
-        return False
+        if not isinstance(other, Inode):
+            return False
+        # Compare exactly what is serialized, see `self.__bytes__()`,
+        # without serializing both inodes.
+        return (
+            self.i_ino == other.i_ino
+            and self.i_mode == other.i_mode
+            and self.i_size == other.i_size
+            and self.num_f_in_dir == other.num_f_in_dir
+            and self.p_ino == other.p_ino
+            and self.block_ids == other.block_ids
+        )
+
+    @property
+    def blocks(self) -> "list[tuple[int, Block]]":
+        """The (id, block) pairs of the data blocks of the inode."""
+        return list(zip(self.block_ids, self.block_objs))
+
+    @blocks.setter
+    def blocks(self, blocks: "list[tuple[int, Block]]") -> None:
+        self.block_ids = array.array("i", [id for id, _ in blocks])
+        self.block_objs = [block for _, block in blocks]
+        self._sector_ids = None
 
     def __bytes__(self) -> "InodeBytes":
         """Serialize inode to bytes."""
+        return _INODE_STRUCT.pack(*self._fields())
+
+    def pack_into(self, buf: bytearray | memoryview, offset: int = 0) -> None:
+        """Serialize inode into buf at offset, see `self.__bytes__()`.
+
+        Contrary to `bytes(inode)`, no intermediate bytes object is
+        created.
+
+        """
+        _INODE_STRUCT.pack_into(buf, offset, *self._fields())
+
+    def _fields(self) -> list[int]:
+        """Return the values that are serialized, in order."""
         assert self.p_ino >= 0, "Forgot to set p_ino on inode"
         # Although data blocks should only be allocated through
         # self.alloc_dblocks(), let's make sure we indeed did.
-        n = len(self.blocks)
+        n = len(self.block_ids)
         assert n <= _MAX_DBLOCKS, "Max number of data blocks exceeded."
 
         # Pad ids with non-existing id number.
-        block_ids = [id for id, _ in self.blocks] + (59 - n) * [_FREE_DBLOCK_ID]
-        return struct.pack(
-            _INODE_LAYOUT,
+        return [
             self.i_ino,
             self.i_mode,
             self.i_size,
             self.num_f_in_dir,
             self.p_ino,
-            *block_ids
-        )
+            *self.block_ids,
+            *_FREE_PAD[n:],
+        ]
 
     @classmethod
     def from_bytes(cls, b: bytearray | bytes, sb: "SuperBlock") -> "Inode":
@@ -154,17 +207,20 @@ class Inode:
             num_f_in_dir,
             p_ino,
             *block_ids
-        ) = struct.unpack(_INODE_LAYOUT, b)
-        blocks = [(id, sb.dzone[id]) for id in block_ids if id != _FREE_DBLOCK_ID]
-        return Inode(
+        ) = _INODE_STRUCT.unpack(b)
+        inode = Inode(
             sb=sb,
             ino=ino,
             mode=mode,
             size=size,
             num_f_in_dir=num_f_in_dir,
-            blocks=blocks,
             p_ino=p_ino,
         )
+        # The ids are padded, see `self.__bytes__()`.
+        ids = [id for id in block_ids if id != _FREE_DBLOCK_ID]
+        inode.block_ids.extend(ids)
+        inode.block_objs.extend(sb.dzone[id] for id in ids)
+        return inode
 
     @staticmethod
     def lookup(pathname: str, sb: "SuperBlock") -> "tuple[int, Inode]":
@@ -206,40 +262,32 @@ class Inode:
         else:
             pathname = pathname.removeprefix("/")
 
-        components = pathname.split("/")
-        if any(not _is_valid_path_component(c) for c in components):
+        # Validate the pathname as a whole, instead of every component
+        # separately, see `_is_valid_path_component()`. The components
+        # can't contain a `/` since the pathname is split on it.
+        if not pathname.isascii():
+            return -errno.EINVAL, sb.root
+        # The pathname is ASCII, so it can be encoded at once. Then the
+        # length of a component is also its number of bytes.
+        names = pathname.encode("ascii").split(b"/")
+        if max(map(len, names)) > _MAX_FNAME_LEN:
             return -errno.EINVAL, sb.root
 
+        # The name index of a directory acts as our dentry cache, see
+        # `Inode.name_index()`. Bind the inode cache once, instead of
+        # going through the superblock for every component.
+        inodes = sb.inodes
         p_inode = sb.root
-        for i, component in enumerate(components):
-            c_as_bytes = component.encode("ascii")
-            found_component = False
-            for _, block in p_inode.blocks:
-                for ino, name in _deserialize_dir_content(block):
-                    if ino == 0:
-                        # The ino=0 is reserved and indicates that the
-                        # entry is empty. In case one would like to
-                        # implement reusing old state within a directory
-                        # we would have to use a special thombstone
-                        # value.
-                        break
-
-                    if name == c_as_bytes:
-                        found_component = True
-                        if ino in sb.inodes:
-                            p_inode = sb.inodes[ino]
-                        else:
-                            p_inode = sb.read_inode_from_disk(ino=ino)
-                        break
-
-                if found_component:
-                    break
-
-            if not found_component:
+        for i, name in enumerate(names):
+            ino = p_inode.name_index().get(name)
+            if ino is not None:
+                # Reads the inode from disk if it isn't in memory.
+                p_inode = inodes[ino]
+            else:
                 # errno.ENOENT should actually be used in both cases,
                 # but that doesn't allow us to differentiate between
                 # them.
-                if i+1 == len(components):
+                if i+1 == len(names):
                     # All subdirectories exist, just the final component
                     # doesn't.
                     return -1, p_inode
@@ -265,6 +313,7 @@ class Inode:
         # Permissions can also be set with e.g.:
         #   `S_IRWXU | S_IRGRP | S_IROTH`
         self.i_mode = stat.S_IFREG | mode
+        self.mark_dirty()
         return 0
 
     def unlink(self) -> int:
@@ -280,11 +329,12 @@ class Inode:
 
         # For more info see: self.create()
         self.i_mode = stat.S_IFDIR | mode
+        self.mark_dirty()
 
         block = self.i_sb.alloc_dblocks(1)
         if not block:
             return -errno.ENOSPC
-        self.blocks.extend(block)
+        self._add_blocks(block)
         self.i_size = BLOCK_SIZE
         # These components are always included in directories.
         self.add_dir_entry(".", self)
@@ -303,6 +353,13 @@ class Inode:
             return -errno.ENOTDIR
         return 0
 
+    def truncate(self) -> None:
+        """Truncate the file to length 0, releasing its data blocks."""
+        self.i_sb.dealloc_dblocks(self.blocks)
+        self.blocks = []
+        self.i_size = 0
+        self.mark_dirty()
+
     # TODO: ...
     def permission(self) -> int:
         return self.i_mode & 0o777
@@ -323,6 +380,18 @@ class Inode:
     # Methods to make our implementation work.
     # ----
 
+    # https://docs.kernel.org/filesystems/vfs.html#struct-super-operations
+    def mark_dirty(self) -> None:
+        """Mark the inode as changed, so it is written on the next sync.
+
+        Call this after changing attributes that are persisted, see
+        `self.__bytes__()`. The superblock then keeps the inode in memory
+        until it is written, even if it is evicted from the inode cache
+        in the meantime.
+
+        """
+        self.i_sb.dirty_inodes[self.i_ino] = self
+
     def add_dir_entry(self, fname: str, inode: "Inode") -> int:
         """Add the given `inode` to the directory `self` under `fname`."""
         # Can only add to a directory.
@@ -332,23 +401,72 @@ class Inode:
         if not _is_valid_path_component(fname):
             return -errno.EINVAL
 
-        b, offset = divmod(self.num_f_in_dir * _DIR_LAYOUT_SIZE, BLOCK_SIZE)
-        if b >= len(self.blocks):
+        b = self.num_f_in_dir >> _DIR_ENTRIES_PER_BLOCK_SHIFT
+        offset = (self.num_f_in_dir & (_DIR_ENTRIES_PER_BLOCK - 1)) * _DIR_LAYOUT_SIZE
+        if b >= len(self.block_objs):
             err = self.alloc_dblocks(1)
             if err != 0:
                 return err
 
         name = fname.encode("ascii")
-        data = struct.pack(_DIR_LAYOUT, inode.i_ino, len(name), name)
-        _, block = self.blocks[b]
-        block.write(offset, data)
+        data = _DIR_STRUCT.pack(inode.i_ino, len(name), name)
+        self.block_objs[b].write(offset, data)
 
         self.num_f_in_dir += 1
+        self.mark_dirty()
+        if self._name_index is not None:
+            self._name_index[name] = inode.i_ino
         return 0
 
+    def name_index(self) -> dict[bytes, int]:
+        """Return the ino of the entries in the directory by their name.
+
+        The directory blocks are only scanned the first time, afterwards
+        the index is kept up to date by `self.add_dir_entry()`.
+
+        """
+        if not stat.S_ISDIR(self.i_mode):
+            # The blocks of a regular file don't contain entries.
+            return {}
+        if self._name_index is None:
+            index = {}
+            # Only scan the entries that are in use. None of them is
+            # empty, so the entries of a block can be unpacked in a
+            # single flat pass without checking for the end.
+            remaining = self.num_f_in_dir
+            for block in self.block_objs:
+                if remaining <= 0:
+                    break
+                limit = min(remaining, _DIR_ENTRIES_PER_BLOCK)
+                with memoryview(block[:limit*_DIR_LAYOUT_SIZE]) as mv:
+                    index.update({
+                        name[:name_len]: ino
+                        for ino, name_len, name in _DIR_STRUCT.iter_unpack(mv)
+                    })
+                remaining -= limit
+            self._name_index = index
+        return self._name_index
+
+    def sector_ids(self) -> list[int]:
+        """Return the first sector of each of the blocks of the inode.
+
+        Reads and writes need them to find contiguous blocks, so they
+        are only computed again after allocating new blocks.
+
+        """
+        if self._sector_ids is None:
+            self._sector_ids = [block.sector_id for block in self.block_objs]
+        return self._sector_ids
+
+    def _add_blocks(self, blocks: "list[tuple[int, Block]]") -> None:
+        for id, block in blocks:
+            self.block_ids.append(id)
+            self.block_objs.append(block)
+        self._sector_ids = None
+
     def alloc_dblocks(self, count: int) -> int:
         """Allocate `count` data blocks for this inode."""
-        if count > _MAX_DBLOCKS - len(self.blocks):
+        if count > _MAX_DBLOCKS - len(self.block_ids):
             # Maximum amount of data blocks exceeded. The inode can only
             # store a max amount of data block pointers, since it has to
             # conform to the _INODE_LAYOUT.
@@ -357,7 +475,8 @@ class Inode:
         dblocks = self.i_sb.alloc_dblocks(count)
         if not dblocks:
             return -errno.ENOSPC
-        self.blocks.extend(dblocks)
+        self._add_blocks(dblocks)
+        self.mark_dirty()
 
         # Directory can grow beyond `BLOCK_SIZE` if it contains many
         # files.
@@ -367,18 +486,32 @@ class Inode:
         return 0
 
 
-def _deserialize_dir_content(
+def iter_dir_entries(
     block: "Block",
+    limit: int = _DIR_ENTRIES_PER_BLOCK,
 ) -> typing.Generator[tuple[int, bytes], None, None]:
-    """Generator over entries in a directory block."""
-    for offset in range(0, BLOCK_SIZE, _DIR_LAYOUT_SIZE):
-        (
-            ino,
-            name_len,
-            name
-        ) = struct.unpack(_DIR_LAYOUT, block[offset:offset+_DIR_LAYOUT_SIZE])
-        name = name[:name_len]
-        yield (ino, name)
+    """Generator over (at most `limit`) entries in a directory block.
+
+    Stops at the first empty entry, since entries are stored one after
+    the other. Useful to list a directory block without knowing how many
+    entries it has, e.g. for readdir(3). Lookups go through
+    `Inode.name_index()` instead.
+
+    """
+    if limit <= 0:
+        return
+
+    # Read the entries at once and unpack them in place, instead of
+    # reading (and copying) every entry separately.
+    with memoryview(block[:limit*_DIR_LAYOUT_SIZE]) as mv:
+        for ino, name_len, name in _DIR_STRUCT.iter_unpack(mv):
+            if ino == 0:
+                # The ino=0 is reserved and indicates that the entry is
+                # empty. In case one would like to implement reusing old
+                # state within a directory we would have to use a
+                # special thombstone value.
+                return
+            yield (ino, name[:name_len])
 
 
 def _is_valid_path_component(name: str) -> bool:
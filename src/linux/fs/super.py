@@ -1,5 +1,7 @@
 import contextlib
 import typing
+import weakref
+from collections import OrderedDict
 
 from linux.block import BLOCK_SIZE
 from linux.block.driver import Block
@@ -9,6 +11,19 @@ from linux.fs.inode import Inode
 if typing.TYPE_CHECKING:
     from linux.block.device import Disk
 
+# Content of a nullified block. Shared, instead of creating a new one
+# for every block that is nullified.
+_ZERO_BLOCK = bytes(BLOCK_SIZE)
+# Maximum number of inodes a superblock keeps in its inode cache.
+INODE_CACHE_SIZE = 1024
+_INODES_PER_BLOCK = BLOCK_SIZE // INODE_SIZE
+# Locating an inode in the izone is then a shift and mask, instead of
+# a division.
+assert _INODES_PER_BLOCK & (_INODES_PER_BLOCK - 1) == 0, (
+    "Number of inodes per block must be a power of two."
+)
+_INODES_PER_BLOCK_SHIFT = _INODES_PER_BLOCK.bit_length() - 1
+
 
 class BitMap:
     """Store integers in the map as a single bit in a sequence of bytes.
@@ -25,6 +40,11 @@ class BitMap:
     def __init__(self, size: int = 0):
         self.size = size
         self.data = bytearray(self.size)
+        # Whether the bitmap changed since it was last written to disk.
+        self.dirty = True
+        # All indices below the hint are known to be used, so searching
+        # for a free index can start there.
+        self._next_hint = 0
 
         # The bits are layed out as follows:
         # 76543210 76543210 ...
@@ -35,19 +55,44 @@ class BitMap:
         Returns -1 in case the bitmap is fully used.
 
         """
-        i = 0
-        for byte in self.data:
-            for j in range(8):
-                if byte & (1 << j):
-                    i += 1
-                else:
-                    return i
-        return -1
+        # Interpret the bits as a single (little endian) integer, which
+        # matches their layout. Then the first unused index is found by
+        # integer operations in C, instead of looping over every bit.
+        start = self._next_hint // 8
+        n = int.from_bytes(self.data[start:], "little")
+        # Adding one sets the lowest unset bit (and clears the bits
+        # below it), thus it is the only bit that is set in both.
+        i = 8*start + ((n + 1) & ~n).bit_length() - 1
+        if i >= 8 * self.size:
+            return -1
+        return i
+
+    def next_free_n(self, n: int) -> list[int]:
+        """Return the first n unused indices, in ascending order.
+
+        Returns fewer indices in case the bitmap doesn't have n unused
+        indices left.
+
+        """
+        # See `self.next_free()`, except that the unused bits are set in
+        # `free` so that the lowest one can be cleared after each pick.
+        start = self._next_hint // 8
+        nbits = 8 * (self.size - start)
+        free = ~int.from_bytes(self.data[start:], "little") & ((1 << nbits) - 1)
+        indices = []
+        while free and len(indices) < n:
+            lowest = free & -free
+            indices.append(8*start + lowest.bit_length() - 1)
+            free ^= lowest
+        return indices
 
     @classmethod
     def from_block(cls, block: Block) -> "BitMap":
         bm = cls(size=BLOCK_SIZE)
-        bm.data[:] = block[:]
+        # Read straight into the bitmap, instead of copying the block
+        # into an intermediate buffer first.
+        block.read_into(0, memoryview(bm.data))
+        bm.dirty = False
         return bm
 
     def alloc(self, i: int) -> None:
@@ -55,33 +100,107 @@ class BitMap:
         if i < 0:
             raise ValueError("Only positive indices are allowed.")
 
-        b, res = divmod(i, 8)
+        # Bytes hold 8 bits, thus locate the bit with a shift and mask
+        # instead of a division.
+        b, res = i >> 3, i & 7
+        # NOTE: Asserts are stripped when running with `python -O`.
         assert self.data[b] & (1 << res) == 0, "Bit already allocated."
-        self.data[b] ^= 1 << res
+        self.data[b] |= 1 << res
+        self.dirty = True
+        if i == self._next_hint:
+            self._next_hint = i + 1
+
+    def alloc_many(self, indices: list[int]) -> None:
+        """Allocate all given indices, see `self.alloc()`."""
+        # Combine the bits per byte, so every byte is only updated once.
+        masks: dict[int, int] = {}
+        for i in indices:
+            if i < 0:
+                raise ValueError("Only positive indices are allowed.")
+            b, res = i >> 3, i & 7
+            masks[b] = masks.get(b, 0) | (1 << res)
+
+        for b, mask in masks.items():
+            assert self.data[b] & mask == 0, "Bit already allocated."
+            self.data[b] |= mask
+        self.dirty = True
+        for i in sorted(indices):
+            if i == self._next_hint:
+                self._next_hint = i + 1
 
     def free(self, i: int) -> None:
         """Free an index (idempotent)."""
         if i < 0:
             raise ValueError("Only positive indices are allowed.")
 
-        b, res = divmod(i, 8)
+        b, res = i >> 3, i & 7
         # 1s with a zero where we want to free, e.g. 11101111
-        mask = ((1 << 8) - 1) ^ (1 << res)
-        self.data[b] &= mask
+        self.data[b] &= ~(1 << res) & 0xFF
+        self.dirty = True
+        self._next_hint = min(self._next_hint, i)
 
     def __iter__(self) -> typing.Iterator[int]:
         """Iterate over all allocated indices."""
-        i = 0
-        for byte in self.data:
-            for j in range(8):
-                if byte & (1 << j):
-                    yield i
-                i += 1
+        # See `self.next_free()`, here the lowest set bit is cleared
+        # after each index so only allocated indices are visited.
+        n = int.from_bytes(self.data, "little")
+        while n:
+            lowest = n & -n
+            yield lowest.bit_length() - 1
+            n ^= lowest
 
     def __buffer__(self, flags: int, /) -> memoryview:
         return self.data.__buffer__(flags)
 
 
+# https://linux-kernel-labs.github.io/refs/heads/master/lectures/fs.html#the-inode-cache
+class InodeCache:
+    """In-memory inodes of a superblock, by their ino.
+
+    Inodes are read from disk when they are first accessed and evicted,
+    least recently used first, once more than `size` inodes are cached.
+
+    Evicted inodes that are dirty stay in memory until they are written
+    to disk, see `SuperBlock.dirty_inodes`. Moreover, an evicted inode
+    can still be in use, e.g. by an open file. Reading it from disk
+    again would result in two diverging objects for the same inode,
+    thus evicted inodes are remembered for as long as they are
+    referenced elsewhere.
+
+    Arguments:
+        sb: The superblock the inodes are part of.
+        size: Maximum number of inodes to keep in memory.
+
+    """
+    def __init__(self, sb: "SuperBlock", size: int = INODE_CACHE_SIZE):
+        self.sb = sb
+        self.size = size
+        self._lru: OrderedDict[int, Inode] = OrderedDict()
+        self._evicted: weakref.WeakValueDictionary[int, Inode] = (
+            weakref.WeakValueDictionary()
+        )
+
+    def __contains__(self, ino: int) -> bool:
+        return ino in self._lru or ino in self._evicted
+
+    def __getitem__(self, ino: int) -> Inode:
+        if (inode := self._lru.get(ino)) is not None:
+            self._lru.move_to_end(ino)
+            return inode
+
+        if (inode := self._evicted.pop(ino, None)) is None:
+            inode = self.sb.read_inode_from_disk(ino=ino)
+        self[ino] = inode
+        return inode
+
+    def __setitem__(self, ino: int, inode: Inode) -> None:
+        self._lru[ino] = inode
+        self._lru.move_to_end(ino)
+        if len(self._lru) > self.size:
+            old_ino, old_inode = self._lru.popitem(last=False)
+            self._evicted[old_ino] = old_inode
+
+
 # https://litux.nl/mirror/kerneldevelopment/0672327201/ch12lev1sec5.html
 class SuperBlock:
     """A superblock object to represent a mounted filesystem.
@@ -100,6 +219,9 @@ class SuperBlock:
 
     """
     def __init__(self, disk: "Disk", format: bool = False):
+        # The block device on which this superblock lives.
+        self.disk = disk
+
         # Superblock identifier.
         # Used to check whether this filesystem is written on a disk.
         self.fs_type = 137
@@ -145,16 +267,18 @@ class SuperBlock:
         self.izone = self.blocks[3:3+izone_size]
         self.dzone = self.blocks[3+izone_size:3+N]
 
-        # Keep all inodes in memory to support opening a file multiple
+        # Keep inodes in memory to support opening a file multiple
         # times as well as making self.lookup() faster by reading inodes
-        # from memory instead of disk.
-        # TODO: In the future don't read in all inodes as that takes
-        # a lot of memory. Just populate it as we go, e.g. LRU.
-        # https://linux-kernel-labs.github.io/refs/heads/master/lectures/fs.html#the-inode-cache
-        # TODO: This map could become a special object that takes care
-        # of eviction so individual methods don't have to take it into
-        # account.
-        self.inodes: dict[int, Inode] = {}
+        # from memory instead of disk. Inodes are read from disk as they
+        # are used, instead of all of them when mounting.
+        self.inodes = InodeCache(sb=self)
+        # Inodes that changed since they were last written to disk, see
+        # `Inode.mark_dirty()`. Referencing them here keeps them in
+        # memory until then, even once they are evicted from the inode
+        # cache.
+        self.dirty_inodes: dict[int, Inode] = {}
+        # Reused to serialize inodes into, see `self.write_inode()`.
+        self._inode_buf = bytearray(INODE_SIZE)
 
         if not format:
             self._init_from_disk()
@@ -190,7 +314,7 @@ class SuperBlock:
         # The filesystem will never fully utilize the disk, because more
         # data blocks and inodes could be created than can be tracked by
         # the filesystem.
-        if self.imap.size < len(self.izone) * (BLOCK_SIZE // INODE_SIZE):
+        if self.imap.size < len(self.izone) * _INODES_PER_BLOCK:
             # imap size too small to allow utilizing all inodes.
             ...
         if self.dmap.size < len(self.dzone):
@@ -209,7 +333,7 @@ class SuperBlock:
         if i == -1:
             # imap is full.
             return None
-        elif i >= len(self.izone) * (BLOCK_SIZE // INODE_SIZE):
+        elif i >= len(self.izone) * _INODES_PER_BLOCK:
             # No free inodes left.
             # If all inodes of a system are occupied, then the system
             # could no longer run. Because in Linux everything is a
@@ -219,23 +343,25 @@ class SuperBlock:
         self.imap.alloc(i)
         inode = Inode(sb=self, ino=i)
         self.inodes[i] = inode
+        inode.mark_dirty()
         return inode
 
     def write_inode(self, inode: Inode) -> None:
         """Persist inode to storage medium."""
         i = inode.i_ino
-        inodes_per_block = BLOCK_SIZE // INODE_SIZE
-        b, offset = divmod(i, inodes_per_block)
-        offset *= INODE_SIZE
+        b = i >> _INODES_PER_BLOCK_SHIFT
+        offset = (i & (_INODES_PER_BLOCK - 1)) * INODE_SIZE
 
         # Write inode to block at offset
         block = self.izone[b]
-        block.write(offset, bytes(inode))
+        inode.pack_into(self._inode_buf)
+        block.write(offset, self._inode_buf)
+        self.dirty_inodes.pop(i, None)
 
     def sync_fs(self) -> int:
         """Write out all dirty data associated with this superblock."""
-        # Since we don't dirty any state when changing it, we assume all
-        # state is dirty.
+        # Apart from inodes and the bitmaps, we don't dirty any state
+        # when changing it, thus we assume all other state is dirty.
         #
         # Attributes:
         #
@@ -253,14 +379,18 @@ class SuperBlock:
         # NOTE: fs_type Fits in single byte so endianness has no impact.
         sblock = self.blocks[0]
         sblock.write(0, self.fs_type.to_bytes())
-        # Write imap and dmap into the following two blocks.
-        iblock = self.blocks[1]
-        iblock.write(0, memoryview(self.imap))
-        dblock = self.blocks[2]
-        dblock.write(0, memoryview(self.dmap))
-        # Persist all inodes. All dirty inodes are in memory.
-        for _, inode in self.inodes.items():
+        # Write imap and dmap into the following two blocks, unless they
+        # didn't change since the last sync.
+        for block, bm in ((self.blocks[1], self.imap), (self.blocks[2], self.dmap)):
+            if bm.dirty:
+                block.write(0, memoryview(bm))
+                bm.dirty = False
+        # Persist the inodes that changed. All dirty inodes are in
+        # memory.
+        for inode in list(self.dirty_inodes.values()):
             self.write_inode(inode)
+        # The disk caches writes, make sure they hit the storage medium.
+        self.disk.sync()
 
         return 0
 
@@ -300,43 +430,34 @@ class SuperBlock:
             not enough space.
 
         """
-        blocks = []
-        for _ in range(count):
-            i = self.dmap.next_free()
-            if i == -1:
-                # dmap is full
-                break
-            elif i >= len(self.dzone):
-                # No more blocks available.
-                break
-            self.dmap.alloc(i)
-            blocks.append((i, self.dzone[i]))
-
-        if len(blocks) == count:
-            # Nullify each block so there is no stale data left.
-            # Otherwise we could hit the case where a new directory is
-            # created but it points to a deleted directory data block
-            # and thereby suddenly having subdirectories and files in
-            # it.
-            for _, block in blocks:
-                block.write(0, len(block) * b"\x00")
-            return blocks
-
-        # Not enough space left, so deallocate the blocks.
-        for i, _ in blocks:
-            self.dmap.free(i)
-        return []
+        # Find all free blocks at once, before allocating any of them.
+        # Indices beyond the dzone don't have a block, since the dmap
+        # can track more blocks than there are.
+        ids = [i for i in self.dmap.next_free_n(count) if i < len(self.dzone)]
+        if len(ids) < count:
+            # Not enough space left.
+            return []
+
+        self.dmap.alloc_many(ids)
+        blocks = [(i, self.dzone[i]) for i in ids]
+        # Nullify each block so there is no stale data left.
+        # Otherwise we could hit the case where a new directory is
+        # created but it points to a deleted directory data block
+        # and thereby suddenly having subdirectories and files in
+        # it.
+        for _, block in blocks:
+            block.write(0, _ZERO_BLOCK)
+        return blocks
 
     def dealloc_dblocks(self, blocks: list[tuple[int, Block]]) -> None:
         for i, _ in blocks:
             self.dmap.free(i)
 
     def read_inode_from_disk(self, ino: int) -> Inode:
-        # TODO: When do we want to store the inode from disk in memory?
-        #   In self.inodes that is.
-        inodes_per_block = BLOCK_SIZE // INODE_SIZE
-        b, offset = divmod(ino, inodes_per_block)
-        offset *= INODE_SIZE
+        # NOTE: Use self.inodes to get an inode, which stores the inodes
+        # that are read from disk in memory.
+        b = ino >> _INODES_PER_BLOCK_SHIFT
+        offset = (ino & (_INODES_PER_BLOCK - 1)) * INODE_SIZE
         block = self.izone[b]
         return Inode.from_bytes(
             b=block[offset:offset+INODE_SIZE],
@@ -346,13 +467,8 @@ class SuperBlock:
     def _init_from_disk(self) -> None:
         self.imap = BitMap.from_block(self.blocks[1])
         self.dmap = BitMap.from_block(self.blocks[2])
-        # TODO: How do actual file systems make this more performant?
-        #   Since they support many more inodes, I'm sure they don't
-        #   have to loop over everything or they simply initialize
-        #   only the first X inodes.
-        for i in self.imap:
-            inode = self.read_inode_from_disk(ino=i)
-            self.inodes[inode.i_ino] = inode
+        # Inodes are only read from disk once they are used, see
+        # `InodeCache`.
 
         # Root node for linked file structure.
         # NOTE: We always know it is the second inode, because the first
@@ -3,7 +3,7 @@ import stat
 import typing
 import os
 
-from linux.fs.file import File
+from linux.fs.file import File, _O_WRITABLE
 from linux.fs.inode import Inode
 from linux.fs.super import SuperBlock
 from linux.sched import Process
@@ -22,6 +22,11 @@ class VFS:
     """
     def __init__(self) -> None:
         self.sblocks: dict[str, SuperBlock] = {}
+        # Mountpoints with their superblock in reverse sorted order, see
+        # `self._get_superblock()`. Only changes on (u)mount.
+        self._sorted_mounts: tuple[tuple[str, SuperBlock], ...] = ()
+        # The only mountpoint with its superblock, if there is just one.
+        self._single_mount: tuple[str, SuperBlock] | None = None
 
     def sysfs(self) -> dict[str, SuperBlock]:
         """sysfs(2).
@@ -54,14 +59,16 @@ class VFS:
         # directly.
         sb = SuperBlock(disk=blockdev)
         self.sblocks[mountpoint] = sb
+        self._sort_mounts()
         return 0
 
     def umount(self, mountpoint: str) -> "ResultInt":
         """Unmount filesystem. umount(2)."""
         if (sb := self.sblocks.get(mountpoint)) is None:
-            raise ValueError(f"Mountpoint not in use.")
+            raise ValueError("Mountpoint not in use.")
         else:
             del self.sblocks[mountpoint]
+            self._sort_mounts()
 
         # Make sure all state is written to persistent storage.
         return sb.sync_fs()
@@ -97,19 +104,25 @@ class VFS:
             the ERRORS section in open(2).
 
         """
-        if stat.S_ISDIR(mode) and flags & os.O_CREAT:
+        # Decode the mode and flags once, they are tested repeatedly.
+        mode_fmt = stat.S_IFMT(mode)
+        is_reg = mode_fmt == stat.S_IFREG
+        creat = flags & os.O_CREAT != 0
+
+        # Test the decoded bits first, before scanning the pathname.
+        if creat and mode_fmt == stat.S_IFDIR:
             return -errno.EINVAL
-        if stat.S_ISREG(mode) and pathname.endswith("/"):
+        if is_reg and pathname.endswith("/"):
             # Our filesystem doesn't allow filenames ending with `/` as
             # to not confuse it with directories.
             return -errno.EINVAL
 
         sb, pathname = self._get_superblock(pathname)
         status, inode = Inode.lookup(pathname, sb)
-        if status == 0 and flags & os.O_CREAT and flags & os.O_EXCL:
+        if status == 0 and creat and flags & os.O_EXCL:
             return -errno.EEXIST
         elif status == -1:
-            if flags & os.O_CREAT == 0:
+            if not creat:
                 # No such file or directory.
                 return -errno.ENOENT
             else:
@@ -124,7 +137,9 @@ class VFS:
                 # inode so that we can lookup() it in the future. In the
                 # Linux kernel, this part would likely manipulate the
                 # dentry.
-                fname = os.path.basename(pathname)
+                # Same as os.path.basename(), without splitting the
+                # pathname.
+                fname = pathname[pathname.rfind("/")+1:]
                 p_inode.add_dir_entry(fname, inode)
         elif status == -2:
             # A directory component in pathname does not exist.
@@ -132,21 +147,19 @@ class VFS:
         elif status < 0:
             return status
 
-        try:
-            fd = proc.oft.index(None)
-        except ValueError:
+        if (free := proc.oft_free_mask) == 0:
             # Maximum number of file descriptors is reached.
             return -errno.EMFILE
+        # The lowest free file descriptor is the lowest set bit.
+        fd = (free & -free).bit_length() - 1
 
         if (
-            stat.S_ISREG(mode)
+            is_reg
             and flags & os.O_TRUNC
-            and flags & (os.O_RDWR | os.O_WRONLY)
+            and flags & _O_WRITABLE
         ):
             # Truncate the file to length 0.
-            inode.i_sb.dealloc_dblocks(inode.blocks)
-            inode.blocks = []
-            inode.i_size = 0
+            inode.truncate()
 
         # TODO: check flags for access mode. Do we even have permission
         # to open this file?
@@ -158,6 +171,7 @@ class VFS:
         )
         f.open()
         proc.oft[fd] = f
+        proc.oft_free_mask &= ~(1 << fd)
 
         return fd
 
@@ -173,16 +187,19 @@ class VFS:
             return -errno.EBADF
         else:
             proc.oft[fd] = None
+            proc.oft_free_mask |= 1 << fd
 
-        if hasattr(file, "flush"):
-            file.flush()
+        # Every File implements flush(), even if there is nothing to
+        # flush, see `File.flush()`.
+        file.flush()
 
         # Operations on the file might have changed the underlying
         # inode, e.g. by increasing the file size new data blocks would
         # have been allocated.
         inode = file.inode
-        sb = file.inode.i_sb
-        sb.write_inode(inode)
+        sb = inode.i_sb
+        if inode.i_ino in sb.dirty_inodes:
+            sb.write_inode(inode)
         return 0
 
     def write(self, fd: "FileDescriptor", buf: bytes, proc: Process) -> "Err | int":
@@ -239,19 +256,36 @@ class VFS:
         inode.p_ino = p_inode.i_ino
         inode.mkdir(mode=mode)
         # Link parent to new directory
-        fname = os.path.basename(pathname)
+        fname = pathname[pathname.rfind("/")+1:]
         p_inode.add_dir_entry(fname, inode)
         return 0
 
     def _get_superblock(self, pathname: str) -> tuple[SuperBlock, str]:
-        # Consider subdirectories first, e.g. having a mountpoint at
-        # `/mnt` and `/` should first `/mnt` as it is otherwise never
-        # considered.
-        for mountpoint in sorted(self.sblocks, reverse=True):
+        if (single := self._single_mount) is not None:
+            # Usually there is just one mount, so there is no need to
+            # consider the order of the mountpoints.
+            mountpoint, sb = single
             if pathname.startswith(mountpoint):
-                sb = self.sblocks[mountpoint]
                 if mountpoint != "/":
-                    pathname = pathname.removeprefix(mountpoint) or "/"
+                    pathname = pathname[len(mountpoint):] or "/"
                 return sb, pathname
-
+        elif self._sorted_mounts:
+            # Consider subdirectories first, e.g. having a mountpoint at
+            # `/mnt` and `/` should first `/mnt` as it is otherwise never
+            # considered.
+            for mountpoint, sb in self._sorted_mounts:
+                if pathname.startswith(mountpoint):
+                    if mountpoint != "/":
+                        pathname = pathname.removeprefix(mountpoint) or "/"
+                    return sb, pathname
+
+        # Nothing is mounted, or no mountpoint is a prefix of pathname.
         raise ValueError("Pathname does not exist in managed superblocks.")
+
+    def _sort_mounts(self) -> None:
+        # Sort on mutation, instead of on every pathname lookup.
+        self._sorted_mounts = tuple(sorted(self.sblocks.items(), reverse=True))
+        if len(self._sorted_mounts) == 1:
+            self._single_mount = self._sorted_mounts[0]
+        else:
+            self._single_mount = None
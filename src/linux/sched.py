@@ -1,4 +1,3 @@
-import resource
 import typing
 
 if typing.TYPE_CHECKING:
@@ -7,6 +6,63 @@ if typing.TYPE_CHECKING:
     from linux.fs.super import SuperBlock
     from linux.types import Err, FileDescriptor, ResultInt
 
+# Maximum number of open file descriptors per process, the default soft
+# limit of Linux (see `ulimit -n`). Note that `resource.RLIMIT_NOFILE` is
+# the identifier of that limit, not its value.
+NOFILE_LIMIT = 1024
+
+
+class SyscallTable:
+    """The system calls that userspace can invoke.
+
+    The set of system calls is fixed, thus they are stored in slots
+    instead of a dict.
+
+    """
+    __slots__ = (
+        "open",
+        "close",
+        "write",
+        "read",
+        "seek",
+        "mkdir",
+        "mount",
+        "umount",
+        "sysfs",
+    )
+
+    open: "typing.Callable[..., FileDescriptor | Err]"
+    close: "typing.Callable[..., ResultInt]"
+    write: "typing.Callable[..., int | Err]"
+    read: "typing.Callable[..., bytearray | Err]"
+    seek: "typing.Callable[..., Err | int]"
+    mkdir: "typing.Callable[..., ResultInt]"
+    mount: typing.Callable[..., int]
+    umount: typing.Callable[..., int]
+    sysfs: "typing.Callable[[], dict[str, SuperBlock]]"
+
+    def __init__(
+        self,
+        open: "typing.Callable[..., FileDescriptor | Err]",
+        close: "typing.Callable[..., ResultInt]",
+        write: "typing.Callable[..., int | Err]",
+        read: "typing.Callable[..., bytearray | Err]",
+        seek: "typing.Callable[..., Err | int]",
+        mkdir: "typing.Callable[..., ResultInt]",
+        mount: typing.Callable[..., int],
+        umount: typing.Callable[..., int],
+        sysfs: "typing.Callable[[], dict[str, SuperBlock]]",
+    ) -> None:
+        self.open = open
+        self.close = close
+        self.write = write
+        self.read = read
+        self.seek = seek
+        self.mkdir = mkdir
+        self.mount = mount
+        self.umount = umount
+        self.sysfs = sysfs
+
 
 class Process:
     """A Linux process.
@@ -17,31 +73,50 @@ class Process:
     process.
 
     """
-    def __init__(self, syscalls: dict[str, typing.Callable]) -> None:
+    __slots__ = (
+        "oft",
+        "oft_free_mask",
+        "syscalls",
+        "_open",
+        "_close",
+        "_write",
+        "_read",
+        "_seek",
+        "_mkdir",
+        "_mount",
+        "_umount",
+        "_sysfs",
+    )
+
+    def __init__(self, syscalls: SyscallTable) -> None:
         # In the Linux kernel stdin, stdout and stderr would be assigned
         # the file descriptors 0, 1 and 2 respectively. These are
         # special files though (see `/dev/stdout`) and are not supported
         # by our file system.
-        self.oft: "list[File | None]" = []
-        for _ in range(resource.RLIMIT_NOFILE):
-            self.oft.append(None)
-        # NOTE: Ideally we use the more performant way:
-        # self.oft: list[File | None] = resource.RLIMIT_NOFILE * [None]
-        # However, lists in Python are invariant. Because File | None
-        # is not a subtype of None (and vice versa), we can't do the
-        # assignment. Otherwise, one would be able to do
-        # l: list[None] = 10 * [None]
-        # l[0] = 1
-        # Thus when creating resource.RLIMIT_NOFILE * [None] Python
-        # creates a list[None] (of which None | int thus isn't seen as
-        # a subtype).
-        # We are okay with this small performance penalty as the
-        # RLIMIT_NOFILE tends to be very small.
-        assert resource.RLIMIT_NOFILE < 100, "Performance degradation."
+        #
+        # NOTE: Lists in Python are invariant, thus a type checker infers
+        # `NOFILE_LIMIT * [None]` as list[None], which isn't a
+        # list[File | None]. That is a static typing concern only, at
+        # runtime all slots simply share the None singleton.
+        self.oft: "list[File | None]" = NOFILE_LIMIT * [None]  # type: ignore[assignment]
+        # Bit fd is set if fd is free in the oft, so the lowest free
+        # file descriptor is found without scanning the oft.
+        self.oft_free_mask = (1 << NOFILE_LIMIT) - 1
 
         # We can mimic security by only passing a subset of syscalls to
         # the process.
         self.syscalls = syscalls
+        # Bind the system calls once, instead of going through the table
+        # on every invocation.
+        self._open = syscalls.open
+        self._close = syscalls.close
+        self._write = syscalls.write
+        self._read = syscalls.read
+        self._seek = syscalls.seek
+        self._mkdir = syscalls.mkdir
+        self._mount = syscalls.mount
+        self._umount = syscalls.umount
+        self._sysfs = syscalls.sysfs
 
     # --------
     # System calls
@@ -53,36 +128,36 @@ class Process:
 
     def open(self, pathname: str, flags: int, mode: int) -> "FileDescriptor | Err":
         """open(2)."""
-        return self.syscalls["open"](pathname=pathname, flags=flags, mode=mode, proc=self)
+        return self._open(pathname, flags, mode, self)
 
     def close(self, fd: "FileDescriptor") -> "ResultInt":
         """close(2)."""
-        return self.syscalls["close"](fd=fd, proc=self)
+        return self._close(fd, self)
 
     def write(self, fd: "FileDescriptor", buf: bytes) -> "int | Err":
         """write(2)."""
-        return self.syscalls["write"](fd=fd, buf=buf, proc=self)
+        return self._write(fd, buf, self)
 
     def read(self, fd: "FileDescriptor", count: int) -> "bytearray | Err":
         """read(2)."""
-        return self.syscalls["read"](fd=fd, count=count, proc=self)
+        return self._read(fd, count, self)
 
     def seek(self, fd: "FileDescriptor", offset: int) -> "Err | int":
         """lseek(2)."""
-        return self.syscalls["seek"](fd=fd, offset=offset, proc=self)
+        return self._seek(fd, offset, self)
 
     def mkdir(self, pathname: str, mode: int = 0o744) -> "ResultInt":
         """mkdir(2)."""
-        return self.syscalls["mkdir"](pathname=pathname, mode=mode)
+        return self._mkdir(pathname, mode)
 
     def mount(self, source: "Disk", target: str) -> int:
         """mount(2)."""
-        return self.syscalls["mount"](blockdev=source, mountpoint=target)
+        return self._mount(source, target)
 
     def umount(self, mountpoint: str) -> int:
         """umount(2)."""
-        return self.syscalls["umount"](mountpoint=mountpoint)
+        return self._umount(mountpoint)
 
     def sysfs(self) -> "dict[str, SuperBlock]":
         """sysfs(2)."""
-        return self.syscalls["sysfs"]()
+        return self._sysfs()
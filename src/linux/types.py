@@ -1,6 +1,15 @@
-import resource
+"""Types used in annotations throughout the kernel.
+
+Only meant to be imported under `typing.TYPE_CHECKING`, so importing
+the kernel doesn't pay for them. Moreover, the values of the `type`
+aliases are only evaluated when accessed, thus the `typing.Annotated`
+metadata isn't constructed even if the module is imported.
+
+"""
 import typing
 
+from linux.sched import NOFILE_LIMIT
+
 class ValueRange(typing.NamedTuple):
     min: int
     max: int
@@ -15,4 +24,4 @@ type Err = typing.Annotated[int, Lt(0)]
 type Success = typing.Literal[0]
 type ResultInt = Err | Success
 
-type FileDescriptor = typing.Annotated[int, ValueRange(0, resource.RLIMIT_NOFILE)]
+type FileDescriptor = typing.Annotated[int, ValueRange(0, NOFILE_LIMIT)]
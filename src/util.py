@@ -1,8 +1,7 @@
-import typing
-
 from linux.block.device import Disk
 from linux.fs.super import SuperBlock
 from linux.fs.vfs import VFS
+from linux.sched import SyscallTable
 
 # https://github.com/torvalds/linux/blob/master/arch/x86/entry/syscalls/syscall_64.tbl
 # In the kernel there would actually be a mapping from integers to the
@@ -10,7 +9,7 @@ from linux.fs.vfs import VFS
 # read from CPU registers we simply map the name of the system call to
 # the appropriate function in a kernel component (only VFS in our case)
 # that would be in charge of executing it.
-def start_kernel(vfs: type[VFS]) -> dict[str, typing.Callable]:
+def start_kernel(vfs: type[VFS]) -> SyscallTable:
     """Mimic running a kernel.
 
     Takes in the different kernel components and outputs the system
@@ -19,17 +18,17 @@ def start_kernel(vfs: type[VFS]) -> dict[str, typing.Callable]:
     """
     i_vfs = vfs()
 
-    return {
-        "open": i_vfs.open,
-        "close": i_vfs.close,
-        "write": i_vfs.write,
-        "read": i_vfs.read,
-        "seek": i_vfs.seek,
-        "mkdir": i_vfs.mkdir,
-        "mount": i_vfs.mount,
-        "umount": i_vfs.umount,
-        "sysfs": i_vfs.sysfs,
-    }
+    return SyscallTable(
+        open=i_vfs.open,
+        close=i_vfs.close,
+        write=i_vfs.write,
+        read=i_vfs.read,
+        seek=i_vfs.seek,
+        mkdir=i_vfs.mkdir,
+        mount=i_vfs.mount,
+        umount=i_vfs.umount,
+        sysfs=i_vfs.sysfs,
+    )
 
 
 def mkfs_slowfs(disk: Disk) -> None:
@@ -1,3 +1,4 @@
+import os
 import tempfile
 
 import pytest
@@ -7,18 +8,28 @@ from linux.block import BLOCK_SIZE
 from linux.fs.super import SuperBlock
 
 
-@pytest.fixture
-def disk():
+@pytest.fixture(scope="session")
+def disk_image():
+    # Create the underlying file once, tests reset it instead, see the
+    # `disk` fixture.
     with tempfile.NamedTemporaryFile(
         mode="r+b",
         buffering=0,
         delete_on_close=False,
     ) as f:
-        size = 20 * BLOCK_SIZE
-        disk = Disk(pathname=f.name, size=size)
-        # Disk starts of nullified as per lseek(2).
-        assert all(byte == 0x0 for byte in disk.read_sector(id=0))
-        yield disk
+        yield f.name
+
+@pytest.fixture
+def disk(disk_image):
+    # Empty the file left behind by a previous test, just like a new
+    # temporary file.
+    os.truncate(disk_image, 0)
+    size = 20 * BLOCK_SIZE
+    disk = Disk(pathname=disk_image, size=size)
+    # Disk starts of nullified as per lseek(2).
+    assert disk.read_sector(id=0) == bytes(disk.sector_size)
+    yield disk
+    disk.close()
 
 @pytest.fixture
 def super(disk):
@@ -7,6 +7,9 @@ from linux.block.device import Disk
 from linux.fs.vfs import VFS
 from linux.sched import Process
 
+# Spans multiple blocks, each with different content.
+_MULTIBLOCK_DATA = BLOCK_SIZE * b"a" + BLOCK_SIZE * b"b" + BLOCK_SIZE * b"c"
+
 
 def test_dir_structure(disk: Disk):
     # Set up filesystem.
@@ -46,10 +49,9 @@ def test_dir_structure(disk: Disk):
 
     # Write accross multiple blocks.
     proc.seek(fd, 0)
-    data = BLOCK_SIZE * b"a" + BLOCK_SIZE * b"b" + BLOCK_SIZE * b"c"
-    proc.write(fd, data)
+    proc.write(fd, _MULTIBLOCK_DATA)
     proc.seek(fd, 0)
-    assert proc.read(fd, len(data)) == bytearray(data)
+    assert proc.read(fd, len(_MULTIBLOCK_DATA)) == _MULTIBLOCK_DATA
 
     proc.close(fd)
     proc.close(fd2)
@@ -79,4 +81,27 @@ def test_dir_structure(disk: Disk):
         mode=0o644,
     )
     assert fd >= 0
-    assert proc.read(fd, len(data)) == bytearray(data)
+    assert proc.read(fd, len(_MULTIBLOCK_DATA)) == _MULTIBLOCK_DATA
+
+
+def test_many_open_files(disk: Disk):
+    syscall_tbl = util.start_kernel(vfs=VFS)
+    util.mkfs_slowfs(disk=disk)
+    proc = Process(syscall_tbl)
+    proc.mount(disk, "/mountpath")
+
+    # More files than `resource.RLIMIT_NOFILE`, which is just the
+    # identifier of the limit, can be open at the same time.
+    fds = []
+    for i in range(16):
+        fd = proc.open(
+            pathname=f"/mountpath/file{i}",
+            flags=os.O_CREAT | os.O_RDWR,
+            mode=0o644,
+        )
+        assert fd == i, "Use lowest unused int for new file descriptor"
+        fds.append(fd)
+
+    proc.close(fds[3])
+    fd = proc.open(pathname="/mountpath/file3", flags=os.O_RDWR, mode=0o644)
+    assert fd == 3, "Closed file descriptors are reused"
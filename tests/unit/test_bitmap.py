@@ -45,3 +45,26 @@ def test_iter():
     bm.alloc(5)
     allocated = [i for i in bm]
     assert allocated == [2, 3, 5]
+
+def test_next_free_gap():
+    size = 3
+    bm = BitMap(size=size)
+    for i in range(8*size):
+        bm.alloc(i)
+    bm.free(17)
+    assert bm.next_free() == 17
+    bm.free(9)
+    assert bm.next_free() == 9
+
+def test_alloc_many():
+    size = 2
+    bm = BitMap(size=size)
+    bm.alloc(0)
+    bm.alloc(2)
+    indices = bm.next_free_n(3)
+    assert indices == [1, 3, 4]
+    bm.alloc_many(indices)
+    assert [i for i in bm] == [0, 1, 2, 3, 4]
+    assert bm.next_free() == 5
+
+    assert len(bm.next_free_n(100)) == 8*size - 5, "Not enough free indices."
@@ -2,13 +2,14 @@ import tempfile
 
 import pytest
 
+from linux.block import BLOCK_SIZE, SECTOR_SIZE
 from linux.block.device import Sector, Disk
 from linux.block.driver import Block
 
 
 def test_sector():
     sector = Sector(id=0)
-    b = bytearray(b"Hello world")
+    b = b"Hello world"
     # The sector should always remain the same size.
     with pytest.raises(ValueError):
         sector[:2] = b
@@ -19,7 +20,7 @@ def test_sector():
 
 def test_disk(disk: Disk):
     sector = Sector(id=0)
-    b = bytearray(b"Hello world")
+    b = b"Hello world"
     sector[:len(b)] = b
 
     # Persist the sector from memory to disk.
@@ -27,7 +28,7 @@ def test_disk(disk: Disk):
     assert disk.read_sector(id=sector.id) == sector
     assert disk.read_sector(id=sector.id) == sector, "Second read has to work as well."
 
-    b = bytearray(b"Hopefully that world isn't Mars")
+    b = b"Hopefully that world isn't Mars"
     sector[:len(b)] = b
     assert disk.read_sector(id=sector.id) != sector
     disk.write_sector(sector)
@@ -41,7 +42,7 @@ def test_disk_persist():
         delete_on_close=False,
     ) as f:
         # First persist some data.
-        b = bytearray(b"Hello world")
+        b = b"Hello world"
         f.write(b)
         # Power up the machine, hopefully with the persisted data from
         # the previous boot.
@@ -50,15 +51,81 @@ def test_disk_persist():
         assert sector[:len(b)] == b
 
 
+def test_disk_sync(disk: Disk):
+    sector = Sector(id=3)
+    b = b"Hello world"
+    sector[:len(b)] = b
+    disk.write_sector(sector)
+
+    # Writes are cached until the disk is synced.
+    other = Disk(pathname=disk._pathname, size=disk.num_sectors * disk.sector_size)
+    assert other.read_sector(id=sector.id) != sector
+    other.close()
+
+    disk.sync()
+    other = Disk(pathname=disk._pathname, size=disk.num_sectors * disk.sector_size)
+    assert other.read_sector(id=sector.id) == sector
+    other.close()
+
+
+def test_disk_pread(disk: Disk):
+    n = 3 * BLOCK_SIZE
+    b = b"Hello world"
+    disk.pwrite_from(memoryview(n * b"a"), sector_id=0)
+    # Cached (dirty) sectors take precedence over the storage.
+    disk.pwrite_from(memoryview(b), sector_id=0, offset=BLOCK_SIZE)
+    assert disk.pread(n - 10, sector_id=0, offset=5) == (
+        (BLOCK_SIZE - 5) * b"a" + b + (2 * BLOCK_SIZE - 5 - len(b)) * b"a"
+    )
+
+    disk.sync()
+    disk._cache.clear()
+    data = disk.pread(n, sector_id=0)
+    assert data == BLOCK_SIZE * b"a" + b + (2 * BLOCK_SIZE - len(b)) * b"a"
+    assert isinstance(data, bytearray), "Same type, whether cached or not"
+
+
+def test_disk_storage_grows(disk: Disk):
+    size = disk.num_sectors * disk.sector_size
+    other = Disk(pathname=disk._pathname, size=size)
+    # The underlying file is still empty.
+    assert all(byte == 0x0 for byte in other.read_sector(id=5))
+
+    sector = Sector(id=3, data=bytearray(SECTOR_SIZE * b"a"))
+    disk.write_sector(sector)
+    disk.sync()
+    assert other.read_sector(id=sector.id) == sector
+    other.close()
+
+
+def test_disk_direct(disk: Disk):
+    size = disk.num_sectors * disk.sector_size
+    # Falls back to buffered I/O if O_DIRECT isn't supported.
+    direct = Disk(pathname=disk._pathname, size=size, direct=True)
+    block = Block(sector_id=8, disk=direct)
+    b = b"Hello world"
+    block.write(offset=3, value=b)
+    direct.close()
+
+    direct = Disk(pathname=disk._pathname, size=size, direct=True)
+    assert Block(sector_id=8, disk=direct)[3:3+len(b)] == b
+    assert Block(sector_id=8, disk=direct)[3] == b[0]
+    direct.close()
+    assert direct._bounce is None, "Bounce buffer is released on close"
+
+    # Bytes that aren't cached are read from the underlying storage.
+    assert Block(sector_id=8, disk=disk)[3] == b[0]
+
+
 def test_block(disk: Disk):
     block = Block(sector_id=0, disk=disk)
 
     # A sector is just an in-memory construct. So unless it is written
     # to disk, it shouldn't impact a block.
     sector = Sector(id=0)
-    b = bytearray(b"Hello world")
+    b = b"Hello world"
     sector[:len(b)] = b
-    assert block[:len(b)] == bytearray(len(b))
+    assert block[:len(b)] == bytes(len(b))
     # Persist.
     disk.write_sector(sector)
     # Partial comparison.
@@ -66,12 +133,13 @@ def test_block(disk: Disk):
     # Full comparison.
     assert block[:len(sector)] == sector
 
-    b = bytearray(b"Hopefully that world isn't Mars")
+    b = b"Hopefully that world isn't Mars"
     block.write(offset=0, value=b)
     assert block[:len(sector)] != sector, "In-memory sector should be unaffected."
     assert block[:len(b)] == b, "A read after a write should return the written data."
+    assert block[len(b) - 1] == b[-1]
 
-    b = bytearray(len(block) + 10)
+    b = bytes(len(block) + 10)
     with pytest.raises(ValueError):
         block.write(offset=0, value=b)
 
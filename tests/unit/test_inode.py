@@ -1,10 +1,11 @@
+import errno
 import stat
 
 import pytest
 
 from linux.fs import INODE_SIZE
 from linux.fs.super import SuperBlock
-from linux.fs.inode import Inode, _DIR_LAYOUT_SIZE, _DIR_LAYOUT
+from linux.fs.inode import Inode, iter_dir_entries, _DIR_LAYOUT_SIZE, _DIR_LAYOUT, _MAX_FNAME_LEN
 
 
 def test_dir_layout():
@@ -37,6 +38,9 @@ def test_serialization(super: SuperBlock):
 
         assert getattr(inode_dec, vname) == value
 
+    inode_dec.blocks = [(2, super.dzone[2])]
+    assert inode != inode_dec, "Different data blocks"
+
 
 def test_reg(super: SuperBlock):
     inode = Inode(sb=super, ino=2, p_ino=1)
@@ -84,3 +88,33 @@ def test_dir(super: SuperBlock):
     assert status == -2, "Subdirectory doesn't exist"
     status, _ = Inode.lookup("/subdir/filemy", super)
     assert status == -1, "File doesn't exist, but subdirectory does."
+
+    # Entries added after a lookup indexed the directory can be found.
+    super.inodes[f_inode.i_ino] = f_inode
+    assert inode.add_dir_entry("other", f_inode) == 0
+    status, found = Inode.lookup("/subdir/other", super)
+    assert status == 0
+    assert found is f_inode
+    assert list(inode.name_index()) == [b".", b"..", b"myfile", b"other"]
+
+
+def test_iter_dir_entries(super: SuperBlock):
+    inode = Inode(sb=super, ino=2, p_ino=super.root.i_ino)
+    super.inodes[inode.i_ino] = inode
+    assert inode.mkdir() == 0, "Success"
+    assert inode.add_dir_entry("myfile", inode) == 0
+
+    block = inode.block_objs[0]
+    entries = list(iter_dir_entries(block))
+    assert entries == [(2, b"."), (super.root.i_ino, b".."), (2, b"myfile")]
+    assert list(iter_dir_entries(block, limit=1)) == [(2, b".")]
+
+
+def test_lookup_invalid(super: SuperBlock):
+    status, inode = Inode.lookup("/" + (_MAX_FNAME_LEN + 1) * "a", super)
+    assert status == -errno.EINVAL, "Component too long"
+    assert inode is super.root
+    status, _ = Inode.lookup("/subdir/héllo", super)
+    assert status == -errno.EINVAL, "Only ASCII is allowed"
+    status, _ = Inode.lookup("/" + _MAX_FNAME_LEN * "a", super)
+    assert status == -1, "Valid pathname that doesn't exist"
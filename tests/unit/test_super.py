@@ -77,3 +77,64 @@ def test_sync_fs(disk: "Disk"):
     while (block := super.alloc_dblocks(count=1)):
         id, _ = block[0]
         assert id != block_id, "Never allocate the same data block."
+
+
+def test_inode_cache(disk: "Disk"):
+    super = SuperBlock(disk=disk, format=True)
+    super.inodes.size = 1
+
+    inode = super.alloc_inode()
+    assert inode is not None
+    inode.p_ino = super.root.i_ino
+    ino = inode.i_ino
+    other = super.alloc_inode()
+    assert other is not None
+    other.p_ino = super.root.i_ino
+    other_ino = other.i_ino
+
+    # Evicted, but still in use.
+    assert super.inodes[ino] is inode
+    # Changes made to a dirty inode after it is evicted aren't lost.
+    other.i_size = 10
+    other.mark_dirty()
+    del other
+    assert super.sync_fs() == 0
+    assert not super.dirty_inodes, "All changes are written to disk."
+
+    # Inodes are only read from disk once they are used.
+    super = SuperBlock(disk=disk)
+    super.inodes.size = 1
+    assert other_ino not in super.inodes
+    assert super.inodes[other_ino].i_size == 10
+
+    # Changes made to an inode that was clean when it was evicted
+    # aren't lost either.
+    inode = super.inodes[ino]
+    assert ino not in super.dirty_inodes
+    # Evicts the inode, whilst it is still in use.
+    super.inodes[other_ino]
+    inode.i_size = 20
+    inode.mark_dirty()
+    del inode
+    assert super.inodes[ino].i_size == 20, "Not a stale copy from disk."
+    assert super.sync_fs() == 0
+
+    super = SuperBlock(disk=disk)
+    assert super.inodes[ino].i_size == 20
+
+
+def test_sync_bitmaps(disk: "Disk"):
+    super = SuperBlock(disk=disk, format=True)
+    assert super.sync_fs() == 0
+    assert not super.imap.dirty and not super.dmap.dirty
+
+    ids = [i for i, _ in super.alloc_dblocks(count=2)]
+    assert super.dmap.dirty and not super.imap.dirty
+    assert super.sync_fs() == 0
+
+    # The bitmaps are read back from disk as they were synced.
+    restored = SuperBlock(disk=disk)
+    assert not restored.dmap.dirty
+    assert restored.dmap.data == super.dmap.data
+    assert restored.imap.data == super.imap.data
+    assert all(i in set(restored.dmap) for i in ids)